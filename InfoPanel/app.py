@@ -1,35 +1,59 @@
+import logging
 import threading
+import time
+from dataclasses import replace
+from typing import Optional, TYPE_CHECKING, Union
 
-from display_helper import Display
-from InfoPanel.core.services import WeatherService, SunService
-from InfoPanel.core.modes import ClockMode, WeatherMode, SunMode, AutoSwitchMode
+from display_helper import DisplayWithBuffer
+from InfoPanel.core.cache import ResponseCache
+from InfoPanel.core.http_client import HttpClient
+from InfoPanel.core.metrics import METRICS, MetricsReporter
+from InfoPanel.core.refresher import BackgroundRefresher, DirectSource, RefresherView, Snapshot
+from InfoPanel.core.services import CityWeatherService, SolarService, WeatherService
+from InfoPanel.core.modes import BUILTIN_MODES, CITIES_SERVICE, SUN_SERVICE, WEATHER_SERVICE
+from InfoPanel.core.profiling import StartupProfiler
 
-from config.settings import AppSettings, SettingsManager
-from core.commands import CommandBus
-from core.commands import CommandListener
-from core.info_panel import InfoPanel
-from core.mode_registry import ModeRegistry, AppMode
-from core.thread_manager import ThreadManager
-from gui.startup import StartupDialog
-from gui.tray import TrayIcon
+from config.settings import AppSettings, DisplaySettings, SettingsManager
+from InfoPanel.core.commands import CommandBus
+from InfoPanel.core.commands import CommandListener
+from InfoPanel.core.info_panel import InfoPanel, PanelGroup
+from InfoPanel.core.container import Container
+from InfoPanel.core.mode_registry import ModeRegistry, ModeSpec, discover_modes
+from InfoPanel.core.thread_manager import ThreadManager
+from InfoPanel.core.watcher import FileWatcher
 
+if TYPE_CHECKING:
+    from InfoPanel.core.runtime import AsyncRuntime  # imported with asyncio only when --async is used
 
-def _build_registry(display: Display, settings: AppSettings) -> ModeRegistry:
-    weather_service = WeatherService(settings.api_key, settings.city) if settings.api_key and settings.city else None
-    sun_service = SunService(settings.city) if settings.city else None
 
-    registry = ModeRegistry()
-    modes_for_auto = {
-        AppMode.CLOCK:   ClockMode(display),
-        AppMode.WEATHER: WeatherMode(display, weather_service),
-        AppMode.SUN:     SunMode(display, sun_service),
-    }
+DEFAULT_BAUDRATE = 9600
+WEATHER_TTL = 30 * 60
+TRAY_DELAY = 5.0  # the tray waits at most this long for the first frames
+SETTINGS_POLL = 2.0
+CLOSE_TIMEOUT = 5.0  # a display reopened on its port waits this long for the old panel to close it
+CACHE_SERVICE = "cache"
+HTTP_SERVICE = "http"
+CITIES_REFRESHER = "cities.refresher"
 
-    for key, mode in modes_for_auto.items():
-        registry.register(key, mode)
+logger = logging.getLogger(__name__)
 
-    registry.register(AppMode.AUTO_SWITCH, AutoSwitchMode(display, modes_for_auto))
-    return registry
+
+def _initial(cached: Optional[tuple[dict, float]]) -> Optional[Snapshot]:
+    return Snapshot(*cached) if cached is not None else None
+
+
+def _weather_service(settings: AppSettings, cache: ResponseCache, http: HttpClient) -> Optional[WeatherService]:
+    return WeatherService(settings.api_key, settings.city, cache, http) if settings.api_key and settings.city else None
+
+
+def _sun_service(settings: AppSettings) -> Optional[SolarService]:
+    return SolarService(settings.city) if settings.city else None
+
+
+def _cities_service(settings: AppSettings, cache: ResponseCache, http: HttpClient) -> Optional[CityWeatherService]:
+    if not settings.api_key or not settings.cities:
+        return None
+    return CityWeatherService(settings.api_key, settings.cities, cache, http)
 
 
 def _resolve_settings() -> AppSettings:
@@ -38,6 +62,8 @@ def _resolve_settings() -> AppSettings:
     if settings:
         return settings
 
+    from gui.startup import StartupDialog  # tkinter is needed only on the first run
+
     result = StartupDialog().ask()
     if result is None:
         raise SystemExit("Настройка отменена пользователем")
@@ -51,21 +77,254 @@ def _resolve_settings() -> AppSettings:
     return settings
 
 
+def _run_tray(bus: CommandBus, panels: list[InfoPanel], labels: dict[str, str], profiler: StartupProfiler):
+    """PIL and pystray are imported on the tray thread once the first frames are drawn"""
+    def run(stop_event: threading.Event) -> None:
+        deadline = time.monotonic() + TRAY_DELAY  # one deadline for all, dead ports do not add up
+        for display_panel in panels:
+            display_panel.first_frame.wait(max(deadline - time.monotonic(), 0.0))
+        profiler.mark("first frame")
+        try:
+            with profiler.phase("tray"):
+                from gui.tray import TrayIcon
+
+                tray = TrayIcon(bus, labels)
+        finally:
+            profiler.report()
+        tray.run(stop_event)
+    return run
+
+
 class App:
+    def __init__(self, profiler: Optional[StartupProfiler] = None, use_async: bool = False) -> None:
+        self._profiler = profiler or StartupProfiler()
+        self._async = use_async
+        self._settings: Optional[AppSettings] = None
+        self._services = Container()
+        self._modes: list[ModeSpec] = []
+        self._refreshers: list[BackgroundRefresher] = []  # built before the runtime started
+        self._panels: dict[str, InfoPanel] = {}
+        self._rotation_cities: Optional[tuple[int, ...]] = None  # the cities the built rotation views are bound to
+        self._group = PanelGroup([])
+        self._runtime: Union[ThreadManager, "AsyncRuntime", None] = None
+
     def start(self) -> None:
-        settings = _resolve_settings()
+        profiler = self._profiler
+        with profiler.phase("settings"):
+            settings = _resolve_settings()
 
-        display = Display(settings.com_port)
-        registry = _build_registry(display, settings)
+        self._settings = settings
+        with profiler.phase("services"):
+            # only registered here, a service is built when the first mode needing it is selected
+            self._services.register(CACHE_SERVICE, lambda services: ResponseCache())
+            self._services.register(HTTP_SERVICE, lambda services: HttpClient())
+            self._services.register(WEATHER_SERVICE, self._weather_refresher)
+            self._services.register(SUN_SERVICE, self._sun_source)
+            self._services.register(CITIES_REFRESHER, self._cities_refresher)
+            self._services.register(CITIES_SERVICE, self._city_views)
+            self._modes = discover_modes(BUILTIN_MODES)
+
+        with profiler.phase("displays"):
+            negotiated = {}
+            for display_settings in settings.all_displays:
+                panel, baudrate = self._build_panel(display_settings)
+                self._panels[display_settings.com_port] = panel
+                if baudrate is not None:
+                    negotiated[display_settings.com_port] = baudrate
+        self._group.set_panels(self._panels.values())
+        self._settings = self._save_baudrates(settings, negotiated)
 
         bus = CommandBus()
-        panel = InfoPanel(display, registry)
+        tray = _run_tray(bus, list(self._panels.values()), {spec.name: spec.label for spec in self._modes}, profiler)
+        listener = CommandListener(bus, self._group)
+        reporter = MetricsReporter(METRICS)
+        watcher = FileWatcher(SettingsManager().path, self._reload, SETTINGS_POLL)
+        if self._async:
+            from InfoPanel.core.runtime import AsyncRuntime
+
+            runtime = AsyncRuntime()
+            self._runtime = runtime
+            for display_panel in self._panels.values():
+                runtime.add_panel(display_panel)
+            runtime.add_thread(tray)
+            runtime.add_commands(bus, listener)
+            runtime.add_periodic(reporter.report, reporter.period)
+            runtime.add_periodic(watcher.check, watcher.period)
+            for refresher in self._startup_refreshers():
+                runtime.add_refresher(refresher)
+            runtime.run()
+            return
+
+        threads = ThreadManager(threading.Event())
+        self._runtime = threads
+        for display_panel in self._panels.values():
+            threads.add(display_panel.start)
+        threads.add(tray)
+        threads.add(listener.start)
+        threads.add(reporter.start)
+        threads.add(watcher.start)
+        for refresher in self._startup_refreshers():
+            threads.add(refresher.start)
+        threads.run()
+
+    def _startup_refreshers(self) -> list[BackgroundRefresher]:
+        """The refreshers built for the initial modes. Once the runtime is set, new ones are spawned on it"""
+        refreshers, self._refreshers = self._refreshers, []
+        return refreshers
+
+    def _weather_refresher(self, services: Container) -> Optional[BackgroundRefresher]:
+        service = _weather_service(self._settings, services.get(CACHE_SERVICE), services.get(HTTP_SERVICE))
+        if service is None:
+            return None
+        return self._start_refresher(BackgroundRefresher(WEATHER_SERVICE, service.fetch_weather, WEATHER_TTL,
+                                                         initial=_initial(service.cached_weather())))
+
+    def _sun_source(self, services: Container) -> Optional[DirectSource]:
+        service = _sun_service(self._settings)
+        if service is None:
+            return None
+        # a lookup in the table of the year, read on every frame: the day changes at the local midnight
+        return DirectSource(SUN_SERVICE, service.get_sun_info)
+
+    def _cities_refresher(self, services: Container) -> Optional[BackgroundRefresher]:
+        service = _cities_service(self._settings, services.get(CACHE_SERVICE), services.get(HTTP_SERVICE))
+        if service is None:
+            return None
+        return self._start_refresher(BackgroundRefresher(CITIES_SERVICE, service.fetch_weather, WEATHER_TTL,
+                                                         initial=_initial(service.cached_weather())))
+
+    def _city_views(self, services: Container) -> dict[int, RefresherView]:
+        self._rotation_cities = self._settings.cities
+        refresher = services.get(CITIES_REFRESHER)
+        if refresher is None:
+            return {}
+        return {city: RefresherView(refresher, lambda weather, city=city: weather.get(city))
+                for city in self._rotation_cities}
+
+    def _start_refresher(self, refresher: BackgroundRefresher) -> BackgroundRefresher:
+        refresher.add_listener(self._group.wake)
+        if self._runtime is None:
+            self._refreshers.append(refresher)
+        elif self._async:
+            self._runtime.spawn_refresher(refresher)
+        else:
+            self._runtime.spawn(refresher.start)
+        return refresher
+
+    def _spawn_panel(self, panel: InfoPanel) -> None:
+        if self._async:
+            self._runtime.spawn_panel(panel)
+        else:
+            self._runtime.spawn(panel.start)
+
+    def _build_panel(self, display_settings: DisplaySettings) -> tuple[InfoPanel, Optional[int]]:
+        """Open the display and make its panel. Returns the negotiated rate if the settings had none
+        and the device answered at one, a link that is not serial has no rate to save"""
+        display = DisplayWithBuffer(display_settings.com_port, display_settings.baudrate or DEFAULT_BAUDRATE,
+                                    metrics=METRICS)
+        negotiated = None
+        if display_settings.baudrate is None:
+            negotiated = display.negotiate_baudrate()
+        # with either runtime: a mode switch can then cancel the frame being written
+        display.start_writer()
+        registry = ModeRegistry(display, self._services, self._modes)
+        panel = InfoPanel(display, registry, name=display_settings.com_port, initial_mode=display_settings.mode)
+        return panel, negotiated
+
+    @staticmethod
+    def _save_baudrates(settings: AppSettings, negotiated: dict[str, int]) -> AppSettings:
+        if negotiated:
+            settings = settings.with_baudrates(negotiated)
+            SettingsManager().save(settings)
+        return settings
+
+    def _reload(self) -> None:
+        """Apply a changed Setting.json: only the services and displays whose settings changed are rebuilt,
+        the disk cache, the HTTP session and the untouched serial connections are kept"""
+        try:
+            settings = SettingsManager().load()
+        except (OSError, ValueError) as e:
+            logger.warning("Настройки не прочитаны, оставлены прежние: %s", e)
+            return
+        if settings is None:
+            logger.warning("Настройки неполные, оставлены прежние")
+            return
+        if settings == self._settings:
+            return
+
+        old = self._settings
+        self._settings = settings  # services and panels built from now on use the new settings
+        self._reload_services(old, settings)
+        negotiated = self._reload_displays(old, settings)
+        self._settings = self._save_baudrates(settings, negotiated)
+        logger.info("Настройки применены")
+
+    def _reload_services(self, old: AppSettings, new: AppSettings) -> None:
+        built = self._services.built()
+        if WEATHER_SERVICE not in built and SUN_SERVICE not in built and CITIES_REFRESHER not in built:
+            return  # no mode used them yet, they are built from the new settings when one is
+        # built already if a weather service is, the sun is computed without them
+        cache, http = self._services.peek(CACHE_SERVICE), self._services.peek(HTTP_SERVICE)
+        weather = _weather_service(new, cache, http)
+        sun = _sun_service(new)
+        # the built rotation reads its views by city ID, so its refresher keeps fetching the same cities
+        rotation = self._rotation_cities if self._rotation_cities is not None else new.cities
+        cities = _cities_service(replace(new, cities=rotation), cache, http)
+        changes = (
+            (WEATHER_SERVICE, (old.city, old.api_key) != (new.city, new.api_key),
+             weather and weather.fetch_weather, weather and weather.cached_weather),
+            (SUN_SERVICE, old.city != new.city, sun and sun.get_sun_info, sun and sun.cached_sun_info),
+            (CITIES_REFRESHER, old.api_key != new.api_key, cities and cities.fetch_weather, cities and cities.cached_weather),
+        )
+        if rotation != new.cities and CITIES_SERVICE in built:
+            logger.warning("Новый список городов показывается только после перезапуска, до него показываются прежние")
+        for name, changed, fetch, cached in changes:
+            if not changed or name not in built:
+                continue
+            refresher = self._services.peek(name)
+            if refresher is None or fetch is None:
+                logger.warning("Сервис %s включается и выключается только после перезапуска", name)
+                continue
+            initial = _initial(cached())
+            refresher.replace(fetch, initial)
+            logger.info("Сервис %s перестроен", name)
+            if initial is None:
+                refresher.refresh()
+
+    def _reload_displays(self, old: AppSettings, new: AppSettings) -> dict[str, int]:
+        old_displays = {d.com_port: d for d in old.all_displays}
+        new_displays = {d.com_port: d for d in new.all_displays}
 
-        stop_event = threading.Event()
-        threads = ThreadManager(stop_event)
+        stopped = {}
+        for port, display_settings in old_displays.items():
+            current = new_displays.get(port)
+            if current is None or current.baudrate not in (None, display_settings.baudrate):
+                stopped[port] = self._panels.pop(port)
+                stopped[port].stop()
+                logger.info("Дисплей %s отключён", port)
 
-        threads.add(TrayIcon(bus).run)
-        threads.add(CommandListener(bus, panel).start)
-        threads.add(panel.start)
+        negotiated = {}
+        panels = {}
+        for port, display_settings in new_displays.items():
+            panel = self._panels.get(port)
+            if panel is None:
+                # the port is closed on the thread of the old panel, a COM port can be open only once
+                if port in stopped and not stopped[port].closed.wait(CLOSE_TIMEOUT):
+                    logger.warning("Дисплей %s не закрыт за %.0f с, не переоткрыт", port, CLOSE_TIMEOUT)
+                    continue
+                try:
+                    panel, baudrate = self._build_panel(display_settings)
+                except OSError as e:
+                    logger.warning("Дисплей %s не открыт: %s", port, e)
+                    continue
+                if baudrate is not None:
+                    negotiated[port] = baudrate
+                self._spawn_panel(panel)
+                logger.info("Дисплей %s подключён", port)
+            elif display_settings.mode != old_displays[port].mode:
+                panel.set_mode(display_settings.mode)
+            panels[port] = panel
 
-        threads.run()
\ No newline at end of file
+        self._panels = panels
+        self._group.set_panels(panels.values())
+        return negotiated
@@ -1,19 +1,47 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from pathlib import Path
 from typing import Optional
 
 from InfoPanel.core.services import SettingsService
 
 
+@dataclass(frozen=True)
+class DisplaySettings:
+    com_port: str
+    mode: str = "clock"
+    baudrate: Optional[int] = None  # None until the link is negotiated
+
+
 @dataclass(frozen=True)
 class AppSettings:
     com_port: str
     api_key: str
     city: str
+    displays: tuple[DisplaySettings, ...] = ()
+    baudrate: Optional[int] = None
+    cities: tuple[int, ...] = ()  # OpenWeatherMap city IDs of the city rotation
+
+    @property
+    def all_displays(self) -> tuple[DisplaySettings, ...]:
+        """The main display followed by the additional ones"""
+        return (DisplaySettings(self.com_port, baudrate=self.baudrate),) + self.displays
+
+    def with_baudrates(self, baudrates: dict[str, int]) -> "AppSettings":
+        """Copy of the settings with the link rates of the given ports"""
+        return replace(
+            self,
+            baudrate=baudrates.get(self.com_port, self.baudrate),
+            displays=tuple(replace(d, baudrate=baudrates.get(d.com_port, d.baudrate)) for d in self.displays),
+        )
 
 class SettingsManager:
     def __init__(self) -> None:
         self._service = SettingsService()
 
+    @property
+    def path(self) -> Path:
+        return self._service.path
+
     def load(self) -> Optional[AppSettings]:
         if not self._service.load():
             return None
@@ -21,8 +49,20 @@ class SettingsManager:
             com_port=self._service.com_port,
             api_key=self._service.api_key,
             city=self._service.city,
+            displays=tuple(
+                DisplaySettings(display["com_port"], display.get("mode", DisplaySettings.mode), display.get("baudrate"))
+                for display in self._service.displays
+            ),
+            baudrate=self._service.baudrate,
+            cities=tuple(self._service.cities),
         )
 
     def save(self, settings: AppSettings) -> None:
         self._service.change_settings(settings.com_port, settings.city, settings.api_key)
-        self._service.save()
\ No newline at end of file
+        self._service.baudrate = settings.baudrate
+        self._service.cities = list(settings.cities)
+        self._service.displays = [
+            {"com_port": d.com_port, "mode": d.mode, **({"baudrate": d.baudrate} if d.baudrate else {})}
+            for d in settings.displays
+        ]
+        self._service.save()
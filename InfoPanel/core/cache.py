@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from InfoPanel.core.metrics import METRICS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Class for keeping API responses on disk between restarts of the app"""
+    __FILE = Path("cache.json")
+
+    def __init__(self, path: Optional[Path] = None, metrics: MetricsRegistry = METRICS) -> None:
+        self._path = path or self.__FILE
+        self._hits = metrics.counter("cache.hits")
+        self._misses = metrics.counter("cache.misses")
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._read()
+        self.evict_expired()
+
+    @staticmethod
+    def key(service: str, location: str, day: date) -> str:
+        return f"{service}:{location}:{day.isoformat()}"
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return the cached value and the time it was stored, None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry["expires_at"] <= time.time():
+            self._misses.inc()
+            return None
+        self._hits.inc()
+        return entry["value"], entry["stored_at"]
+
+    def put(self, key: str, value: Any, ttl: float) -> None:
+        self.put_many({key: value}, ttl)
+
+    def put_many(self, values: Dict[str, Any], ttl: float) -> None:
+        """Store several values with one write of the file"""
+        now = time.time()
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = {"value": value, "stored_at": now, "expires_at": now + ttl}
+            self._evict(now)
+            self._write()
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            evicted = self._evict(time.time())
+            if evicted:
+                self._write()
+        return evicted
+
+    def _evict(self, now: float) -> int:
+        expired = [key for key, entry in self._entries.items() if entry["expires_at"] <= now]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        if not self._path.exists():
+            return {}
+        try:
+            with open(self._path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning("Кэш %s не прочитан: %s", self._path, e)
+            return {}
+
+    def _write(self) -> None:
+        directory = self._path.parent
+        fd, tmp_path = tempfile.mkstemp(prefix=self._path.name, suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(self._entries, file, ensure_ascii=False)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.warning("Кэш %s не сохранён: %s", self._path, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -1,31 +1,104 @@
-import queue
 import threading
+import time
 import logging
-from queue import Queue
-from typing import Optional
+from collections import OrderedDict, deque
+from typing import Deque, Optional, TYPE_CHECKING, Union
 
-from InfoPanel.core.info_panel import InfoPanel
+from InfoPanel.core.info_panel import InfoPanel, PanelGroup
+from InfoPanel.core.metrics import METRICS, MetricsRegistry
+
+if TYPE_CHECKING:
+    import asyncio  # only the asyncio runtime needs it, the thread runtime starts without it
 
 logger = logging.getLogger(__name__)
 
 EXIT_COMMAND = "exit"
+CONTROL_COMMANDS = frozenset({EXIT_COMMAND})
 
 
 class CommandBus:
-    def __init__(self) -> None:
-        self._queue: Queue[str] = Queue()
+    """Commands from the tray to the listener.\n
+    Control commands (exit) jump ahead of mode commands. Mode commands are coalesced:
+    a queued mode for a display is replaced by a newer one, and a mode for all displays
+    replaces every queued mode, so clicking through the tray applies only the last choice"""
+
+    def __init__(self, metrics: MetricsRegistry = METRICS, coalesce: bool = True) -> None:
+        self._coalesce = coalesce
+        self._condition = threading.Condition()
+        self._control: Deque[tuple[str, float]] = deque()
+        self._modes: OrderedDict[object, tuple[str, float]] = OrderedDict()
+        self._sequence = 0
+        self._loop: Optional["asyncio.AbstractEventLoop"] = None
+        self._ready: Optional["asyncio.Event"] = None
+        self._wait_time = metrics.histogram("commands.queue_wait_seconds")
+        self._coalesced = metrics.counter("commands.coalesced")
+
+    def attach(self, loop: "asyncio.AbstractEventLoop") -> None:
+        """Deliver the commands to receive_async() on the loop instead of receive().
+        Call on the loop thread; send() stays safe to call from any thread (the tray)"""
+        import asyncio
+
+        self._ready = asyncio.Event()
+        self._loop = loop
 
     def send(self, command: str) -> None:
-        self._queue.put(command)
+        item = (command, time.perf_counter())
+        with self._condition:
+            if command in CONTROL_COMMANDS:
+                self._control.append(item)
+            else:
+                self._queue_mode(command, item)
+            self._condition.notify()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                logger.debug("Команда %s после остановки отброшена", command)
 
-    def receive(self, timeout: float = 0.5) -> Optional[str]:
-        try:
-            return self._queue.get(timeout=timeout)
-        except queue.Empty:
+    def _queue_mode(self, command: str, item: tuple[str, float]) -> None:
+        if not self._coalesce:
+            self._sequence += 1
+            self._modes[self._sequence] = item
+            return
+
+        target, separator, _ = command.rpartition(PanelGroup.ADDRESS_SEPARATOR)
+        if not separator:
+            self._coalesced.inc(len(self._modes))
+            self._modes.clear()
+        elif self._modes.pop(target, None) is not None:
+            self._coalesced.inc()
+        self._modes[target] = item
+
+    def _pop(self) -> Optional[str]:
+        if self._control:
+            command, sent_at = self._control.popleft()
+        elif self._modes:
+            _, (command, sent_at) = self._modes.popitem(last=False)
+        else:
             return None
+        self._wait_time.observe(time.perf_counter() - sent_at)
+        return command
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._control) + len(self._modes)
+
+    def receive(self, timeout: float = 0.5) -> Optional[str]:
+        with self._condition:
+            self._condition.wait_for(lambda: self._control or self._modes, timeout)
+            return self._pop()
+
+    async def receive_async(self) -> str:
+        while True:
+            self._ready.clear()
+            with self._condition:
+                command = self._pop()
+            if command is not None:
+                return command
+            await self._ready.wait()
 
 class CommandListener:
-    def __init__(self, bus: CommandBus, panel: InfoPanel) -> None:
+    def __init__(self, bus: CommandBus, panel: Union[InfoPanel, PanelGroup]) -> None:
         self._bus = bus
         self._panel = panel
 
@@ -35,13 +108,20 @@ class CommandListener:
             if command is None:
                 continue
 
-            logger.debug("Получена команда: %s", command)
-
-            if command == EXIT_COMMAND:
+            if not self.handle(command):
                 stop_event.set()
+                self._panel.wake()
                 break
 
-            try:
-                self._panel.set_mode(command)
-            except ValueError as e:
-                logger.warning("Неизвестная команда: %s", e)
\ No newline at end of file
+    def handle(self, command: str) -> bool:
+        """Apply one command. Returns False for the exit command"""
+        logger.debug("Получена команда: %s", command)
+
+        if command == EXIT_COMMAND:
+            return False
+
+        try:
+            self._panel.set_mode(command)
+        except ValueError as e:
+            logger.warning("Неизвестная команда: %s", e)
+        return True
\ No newline at end of file
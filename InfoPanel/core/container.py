@@ -0,0 +1,49 @@
+import threading
+from typing import Callable, Dict, List
+
+ServiceFactory = Callable[["Container"], object]
+
+
+class Container:
+    """Services shared by the modes of every display. A service is built on the first get(),
+    so the ones no selected mode needs (an API client, a refresher thread) are never made"""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()  # a factory may get() the services it depends on
+        self._factories: Dict[str, ServiceFactory] = {}
+        self._instances: Dict[str, object] = {}
+
+    def register(self, name: str, factory: ServiceFactory) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def provide(self, name: str, instance: object) -> None:
+        """Register a service that is already built"""
+        with self._lock:
+            self._instances[name] = instance
+
+    def get(self, name: str) -> object:
+        instance = self._instances.get(name, self)
+        if instance is not self:
+            return instance
+
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            if name not in self._factories:
+                raise KeyError(f"Сервис '{name}' не зарегистрирован")
+            instance = self._factories[name](self)
+            self._instances[name] = instance
+            return instance
+
+    def peek(self, name: str) -> object:
+        """The service if it is built already, None otherwise"""
+        return self._instances.get(name)
+
+    def built(self) -> List[str]:
+        with self._lock:
+            return list(self._instances)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories or name in self._instances
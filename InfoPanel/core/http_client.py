@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from InfoPanel.core.metrics import METRICS, MetricsRegistry
+
+if TYPE_CHECKING:
+    import requests
+
+Request = Tuple[str, Dict[str, Any]]
+
+
+class HttpClient:
+    """Keep-alive HTTP session shared by all services.\n
+    Connections are pooled per host, independent requests can run concurrently.
+    requests is imported and the session is made on the first request, off the startup path"""
+
+    def __init__(self, pool_size: int = 4, timeout: float = 10, session: Optional["requests.Session"] = None,
+                 metrics: MetricsRegistry = METRICS) -> None:
+        self._timeout = timeout
+        self._pool_size = pool_size
+        self._fetch_time = metrics.histogram("http.fetch_seconds")
+        self._errors = metrics.counter("http.errors")
+        self._given_session = session
+        self._session: Optional["requests.Session"] = None
+        self._session_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="http")
+
+    def _get_session(self) -> "requests.Session":
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = self._given_session or requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self._pool_size, pool_maxsize=self._pool_size)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def get_json(self, url: str, params: Dict[str, Any]) -> Any:
+        """
+        :raises requests.RequestException: If the HTTP request fails.
+        """
+        session = self._get_session()
+        import requests
+
+        try:
+            with self._fetch_time.time():
+                response = session.get(url, params=params, timeout=self._timeout)
+                response.raise_for_status()
+                return response.json()
+        except (requests.RequestException, ValueError):
+            self._errors.inc()
+            raise
+
+    def get_json_many(self, batch: Sequence[Request]) -> List[Any]:
+        """Run the requests concurrently and return the results in the same order.
+
+        :raises requests.RequestException: If any of the HTTP requests fails.
+        """
+        futures = [self._executor.submit(self.get_json, url, params) for url, params in batch]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
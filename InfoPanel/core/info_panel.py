@@ -1,23 +1,144 @@
 import threading
+import time
+from typing import Callable, List, Sequence
 
 from display_helper import Display
+from InfoPanel.core.metrics import METRICS, MetricsRegistry
 from InfoPanel.core.modes import Mode
 from InfoPanel.core.mode_registry import ModeRegistry, AppMode
 
 
 class InfoPanel:
-    def __init__(self, display: Display, registry: ModeRegistry) -> None:
+    MAX_SLEEP = 60.0
+    SWITCH_TARGET = 0.05  # seconds from set_mode() to the first frame of the mode handed to the display
+
+    def __init__(self, display: Display, registry: ModeRegistry, metrics: MetricsRegistry = METRICS,
+                 name: str = "", initial_mode: str = AppMode.CLOCK.value) -> None:
         self._display = display
         self._registry = registry
-        self._current_mode: Mode = registry.get(AppMode.CLOCK)
+        self._metrics = metrics
+        self._name = name
+        self._tick_time = metrics.histogram("panel.tick_seconds")
+        self._switch_time = metrics.histogram("panel.switch_seconds")
+        self._slow_switches = metrics.counter("panel.slow_switches")
+        self._cancelled = metrics.counter("panel.cancelled_frames")
+        self._switch_requested = 0.0
+        self._current_mode: Mode = registry.get_by_name(initial_mode)
         self._last_mode: Mode = self._current_mode
+        self._wake = threading.Event()
+        self.first_frame = threading.Event()
+        self.closed = threading.Event()  # set once a stopped panel has closed its display
+        self._stopped = threading.Event()
+        self._wake_listeners: List[Callable[[], None]] = []
+
+    @property
+    def name(self) -> str:
+        return self._name
 
     def set_mode(self, name: str) -> None:
-        self._current_mode = self._registry.get_by_name(name)
+        mode = self._registry.get_by_name(name)
+        self._switch_requested = time.perf_counter()
+        self._current_mode = mode
+        self.wake()
+
+    def wake(self) -> None:
+        self._wake.set()
+        for listener in self._wake_listeners:
+            listener()
+
+    def add_wake_listener(self, listener: Callable[[], None]) -> None:
+        """Call the listener on every wake, e.g. to wake a panel driven by the asyncio runtime"""
+        self._wake_listeners.append(listener)
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    def stop(self) -> None:
+        """Stop this panel only, its thread closes the display on the way out"""
+        self._stopped.set()
+        self.wake()
 
     def start(self, stop_event: threading.Event) -> None:
+        self.begin()
+        while not stop_event.is_set() and not self._stopped.is_set():
+            self._wake.wait(self.tick())
+        self.end()
+
+    def begin(self) -> None:
         self._display.clear()
-        while not stop_event.is_set():
-            self._current_mode.apply(self._last_mode)
-            self._last_mode = self._current_mode
-            stop_event.wait(0.5)
+
+    def end(self) -> None:
+        """Close the display of a panel stopped on its own, the process keeps running"""
+        if self._stopped.is_set():
+            try:
+                self._display.close()
+            finally:
+                self.closed.set()
+
+    def tick(self) -> float:
+        """Draw the current mode once. Returns the seconds until the next tick is due"""
+        self._wake.clear()
+        mode = self._current_mode
+        started = time.perf_counter()
+        switching = mode is not self._last_mode
+        with self._display.frame():
+            frame = mode.update(self._last_mode)
+            if self._current_mode is not mode:
+                # switched again while the frame was built: drop it and draw the new mode at once
+                self._cancelled.inc()
+                return 0.0
+            if frame is not None:
+                # the first frame of a new mode supersedes the frames of the old one still queued
+                self._display.show(frame, preempt=switching)
+        applied = time.perf_counter()
+        self._last_mode = mode
+        if switching and self._switch_requested:
+            switch_time = applied - self._switch_requested
+            self._switch_time.observe(switch_time)
+            if switch_time > self.SWITCH_TARGET:
+                self._slow_switches.inc()
+        self._metrics.histogram(f"mode.{type(mode).__name__}.apply_seconds").observe(applied - started)
+
+        now = time.time()
+        sleep = min(max(mode.deadline(now) - now, 0.0), self.MAX_SLEEP)
+        retry = self._display.check_link()
+        if retry is not None:
+            sleep = min(sleep, max(retry - time.monotonic(), 0.0))
+        self._tick_time.observe(time.perf_counter() - started)
+        self.first_frame.set()
+        return sleep
+
+
+class PanelGroup:
+    """Several panels driven by one process. A command goes to every panel,
+    or to one panel when it is addressed as '<panel name>:<mode>'"""
+    ADDRESS_SEPARATOR = ":"
+
+    def __init__(self, panels: Sequence[InfoPanel]) -> None:
+        self._panels = list(panels)
+
+    @property
+    def panels(self) -> list[InfoPanel]:
+        return list(self._panels)
+
+    def set_panels(self, panels: Sequence[InfoPanel]) -> None:
+        """Replace the panels, e.g. after a display was added or removed in the settings"""
+        self._panels = list(panels)
+
+    def set_mode(self, command: str) -> None:
+        target, separator, mode = command.rpartition(self.ADDRESS_SEPARATOR)
+        if not separator:
+            for panel in self._panels:
+                panel.set_mode(mode)
+            return
+
+        panels = [panel for panel in self._panels if panel.name == target]
+        if not panels:
+            raise ValueError(f"Неизвестный дисплей: '{target}'")
+        for panel in panels:
+            panel.set_mode(mode)
+
+    def wake(self) -> None:
+        for panel in self._panels:
+            panel.wake()
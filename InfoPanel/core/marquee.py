@@ -0,0 +1,63 @@
+import bisect
+import math
+
+# a deadline computed by next_change() must already show the next window
+_EPSILON = 1e-6
+
+
+class Marquee:
+    """Text scrolled through a row of the display.\n
+    Every visible window and the time it stays on screen are computed once per text:
+    the first and the last window stay for `pause` seconds, the others for 1/speed seconds,
+    then the text jumps back to the start"""
+
+    def __init__(self, text: str, width: int, started_at: float, speed: float = 3.0, pause: float = 1.5) -> None:
+        if width <= 0:
+            raise ValueError("width must be positive")
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+
+        self._text = text
+        self._started_at = started_at
+
+        positions = max(len(text) - width + 1, 1)
+        self._windows = [text[i:i + width] for i in range(positions)]
+
+        durations = [1 / speed] * positions
+        durations[0] = durations[-1] = max(pause, 1 / speed)
+        self._starts = []
+        elapsed = 0.0
+        for duration in durations:
+            self._starts.append(elapsed)
+            elapsed += duration
+        self._period = elapsed
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @property
+    def scrolling(self) -> bool:
+        return len(self._windows) > 1
+
+    def _position(self, now: float) -> tuple[int, float]:
+        """Index of the visible window and the start of the current cycle"""
+        elapsed = max(now - self._started_at, 0.0) + _EPSILON
+        cycles = math.floor(elapsed / self._period)
+        offset = elapsed - cycles * self._period
+        return bisect.bisect_right(self._starts, offset) - 1, self._started_at + cycles * self._period
+
+    def window(self, now: float) -> str:
+        if not self.scrolling:
+            return self._windows[0]
+        index, _ = self._position(now)
+        return self._windows[index]
+
+    def next_change(self, now: float) -> float:
+        """Time when the visible window changes"""
+        if not self.scrolling:
+            return math.inf
+        index, cycle_start = self._position(now)
+        if index + 1 < len(self._starts):
+            return cycle_start + self._starts[index + 1]
+        return cycle_start + self._period
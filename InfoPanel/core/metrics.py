@@ -0,0 +1,158 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+# seconds, from 100 us to 10 s
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+BYTE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class Counter:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def snapshot(self) -> int:
+        return self._value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._value = 0
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self._lock = threading.Lock()
+        self._bounds = tuple(buckets)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket that holds the given fraction of observations"""
+        with self._lock:
+            target = fraction * self._count
+            seen = 0
+            for bound, count in zip(self._bounds, self._counts):
+                seen += count
+                if count and seen >= target:
+                    return min(bound, self._max)
+            return self._max
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            count, total, maximum = self._count, self._sum, self._max
+        return {
+            "count": count,
+            "avg": total / count if count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": maximum,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(self._bounds) + 1)
+            self._count = 0
+            self._sum = 0.0
+            self._max = 0.0
+
+
+Metric = Union[Counter, Histogram]
+
+
+class MetricsRegistry:
+    """Named counters and histograms for the render, serial and API hot paths"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def counter(self, name: str) -> Counter:
+        return self._get(name, Counter)
+
+    def histogram(self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Histogram names ending with _seconds are shown in milliseconds"""
+        return self._get(name, Histogram, buckets)
+
+    def _get(self, name: str, kind: type, *args) -> Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, kind(*args))
+        if not isinstance(metric, kind):
+            raise TypeError(f"Метрика '{name}' уже зарегистрирована как {type(metric).__name__}")
+        return metric
+
+    def snapshot(self) -> Dict[str, Union[int, Dict[str, float]]]:
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {name: metric.snapshot() for name, metric in sorted(metrics.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def format(self) -> str:
+        lines = []
+        for name, value in self.snapshot().items():
+            if isinstance(value, dict):
+                scale, unit = (1000, "ms") if name.endswith("_seconds") else (1, "")
+                lines.append(f"{name}: n={value['count']} avg={value['avg'] * scale:.1f}{unit} "
+                             f"p95={value['p95'] * scale:.1f}{unit} max={value['max'] * scale:.1f}{unit}")
+            else:
+                lines.append(f"{name}: {value}")
+        return "\n".join(lines)
+
+
+class MetricsReporter:
+    def __init__(self, registry: MetricsRegistry, period: float = 300.0) -> None:
+        self._registry = registry
+        self._period = period
+
+    @property
+    def period(self) -> float:
+        return self._period
+
+    def report(self) -> None:
+        logger.info("Метрики:\n%s", self._registry.format())
+
+    def start(self, stop_event: threading.Event) -> None:
+        while not stop_event.wait(self._period):
+            self.report()
+
+
+METRICS = MetricsRegistry()
@@ -1,38 +1,147 @@
+import logging
+import threading
+from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, TYPE_CHECKING
+from importlib.metadata import entry_points
+from typing import Callable, Dict, Iterable, List, Optional, TYPE_CHECKING, Union
+
+from InfoPanel.core.container import Container
 
 if TYPE_CHECKING:
+    from display_helper import Display
     from InfoPanel.core.modes import Mode
 
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "infopanel.modes"
+
 
 class AppMode(str, Enum):
     CLOCK = "clock"
     WEATHER = "weather"
     SUN = "sun"
     AUTO_SWITCH = "auto_switch_mode"
+    CITIES = "cities"
 
     @classmethod
     def values(cls) -> list[str]:
         return [m.value for m in cls]
 
 
+@dataclass(frozen=True)
+class ModeContext:
+    """What a mode factory gets: the display of the panel, the shared services
+    and the registry of the panel, for modes made of other modes"""
+    display: "Display"
+    services: Container
+    registry: "ModeRegistry"
+
+
+ModeFactory = Callable[[ModeContext], "Mode"]
+
+
+@dataclass(frozen=True)
+class ModeSpec:
+    name: str
+    label: str
+    factory: ModeFactory
+
+
+def _key(key: Union[AppMode, str]) -> str:
+    return key.value if isinstance(key, AppMode) else key
+
+
+def _entry_point_spec(entry_point) -> ModeSpec:
+    """The module of a plugin is imported when its mode is first selected, not at startup.
+    The entry point is a mode factory: a callable taking a ModeContext"""
+    def factory(context: ModeContext) -> "Mode":
+        return entry_point.load()(context)
+
+    return ModeSpec(entry_point.name, entry_point.name.replace("_", " ").title(), factory)
+
+
+def discover_modes(builtin: Iterable[ModeSpec] = (), group: str = ENTRY_POINT_GROUP) -> List[ModeSpec]:
+    """The built-in modes followed by the modes of the installed packages
+    (entry points of the group, name = mode name). A plugin can not replace a built-in mode"""
+    specs = {spec.name: spec for spec in builtin}
+    try:
+        found = entry_points(group=group)
+    except TypeError:  # Python 3.9
+        found = entry_points().get(group, ())
+
+    for entry_point in found:
+        if entry_point.name in specs:
+            logger.warning("Режим '%s' из %s уже есть, пропущен", entry_point.name, entry_point.value)
+            continue
+        specs[entry_point.name] = _entry_point_spec(entry_point)
+    return list(specs.values())
+
+
 class ModeRegistry:
-    def __init__(self) -> None:
-        self._modes: Dict[AppMode, "Mode"] = {}
+    """Modes of one panel by name. A mode registered by a factory is built on first use,
+    so startup time and memory grow with the modes selected, not with the modes installed"""
+
+    def __init__(self, display: Optional["Display"] = None, services: Optional[Container] = None,
+                 specs: Iterable[ModeSpec] = ()) -> None:
+        self._lock = threading.RLock()  # AutoSwitchMode gets the other modes from its factory
+        self._context = ModeContext(display, services if services is not None else Container(), self)
+        self._specs: Dict[str, ModeSpec] = {}
+        self._modes: Dict[str, "Mode"] = {}
+        for spec in specs:
+            self.register_factory(spec.name, spec.factory, spec.label)
 
-    def register(self, key: AppMode, mode: "Mode") -> None:
-        self._modes[key] = mode
+    def register(self, key: Union[AppMode, str], mode: "Mode") -> None:
+        """Register a mode that is already built"""
+        with self._lock:
+            self._modes[_key(key)] = mode
 
-    def get(self, key: AppMode) -> "Mode":
-        if key not in self._modes:
-            raise KeyError(f"Режим '{key}' не зарегистрирован")
-        return self._modes[key]
+    def register_factory(self, key: Union[AppMode, str], factory: ModeFactory, label: Optional[str] = None) -> None:
+        name = _key(key)
+        with self._lock:
+            self._specs[name] = ModeSpec(name, label or name.replace("_", " ").title(), factory)
+            self._modes.pop(name, None)
+
+    def get(self, key: Union[AppMode, str]) -> "Mode":
+        name = _key(key)
+        mode = self._modes.get(name)
+        if mode is not None:
+            return mode
+
+        with self._lock:
+            if name in self._modes:
+                return self._modes[name]
+            spec = self._specs.get(name)
+            if spec is None:
+                raise KeyError(f"Режим '{name}' не зарегистрирован")
+            try:
+                mode = spec.factory(self._context)
+            except Exception as e:
+                logger.exception("Режим '%s' не создан", name)
+                raise ValueError(f"Режим '{name}' не создан: {e}") from e
+            self._modes[name] = mode
+            return mode
 
     def get_by_name(self, name: str) -> "Mode":
         try:
-            return self.get(AppMode(name))
-        except ValueError:
-            raise ValueError(f"Неизвестный режим: '{name}'. Доступные: {AppMode.values()}")
+            return self.get(name)
+        except KeyError:
+            raise ValueError(f"Неизвестный режим: '{name}'. Доступные: {self.names()}")
+
+    def names(self) -> list[str]:
+        with self._lock:
+            return list(dict.fromkeys([*self._specs, *self._modes]))
+
+    def labels(self) -> Dict[str, str]:
+        """Menu labels of every mode, without building any"""
+        with self._lock:
+            return {name: self._specs[name].label if name in self._specs else name.replace("_", " ").title()
+                    for name in self.names()}
+
+    def built(self) -> list[str]:
+        with self._lock:
+            return list(self._modes)
 
-    def all_modes(self) -> Dict[AppMode, "Mode"]:
-        return dict(self._modes)
\ No newline at end of file
+    def all_modes(self) -> Dict[str, "Mode"]:
+        """The modes built so far"""
+        with self._lock:
+            return dict(self._modes)
@@ -1,17 +1,81 @@
+import math
 import time
 from abc import abstractmethod, ABC
-from datetime import datetime
-from typing import Dict
+from datetime import datetime, timedelta
+from typing import Dict, Mapping, Optional
 
-import requests
+from InfoPanel.core.marquee import Marquee
+from InfoPanel.core.mode_registry import AppMode, ModeContext, ModeSpec
+from InfoPanel.core.refresher import BackgroundRefresher, RefresherView, Snapshot
+from display_helper import Display, Frame
 
-from InfoPanel.core.services import WeatherService, SunService
-from display_helper import Display
+STALE_MARK = "*"
+WEATHER_SERVICE = "weather"  # Optional[BackgroundRefresher[dict]] in the service container
+SUN_SERVICE = "sun"  # Optional[DirectSource[dict]], the sun data of today read from the local table
+CITIES_SERVICE = "cities"  # Dict[int, RefresherView[dict]], the weather of every city read from one refresher
+
+
+def _mark_stale(line: str, stale: bool) -> str:
+    return line + STALE_MARK if stale else line
 
 
 class Mode(ABC):
+    IDLE_PERIOD = 60.0
+    SCROLL_SPEED = 3.0
+    SCROLL_PAUSE = 1.5
+
     def __init__(self, display: Display):
         self._display = display
+        self._marquees: Dict[int, Marquee] = {}
+        self._lines: tuple[str, ...] = ()
+        self._next_scroll = math.inf
+        self._frame: Optional[Frame] = None
+
+    def next_deadline(self, now: float) -> float:
+        """Time (as time.time()) when apply() has something new to draw"""
+        return now + self.IDLE_PERIOD
+
+    def deadline(self, now: float) -> float:
+        """Time of the next redraw, including the steps of scrolling lines"""
+        return min(self.next_deadline(now), self._next_scroll)
+
+    def update(self, last_mode: "Mode") -> Optional[Frame]:
+        """apply() the mode and move the scrolling lines.
+        Returns the frame to show, None when the screen stays the same"""
+        self.apply(last_mode)
+        now = time.time()
+        if self._next_scroll <= now:
+            self._draw_visible(now)
+        frame, self._frame = self._frame, None
+        return frame
+
+    def _draw_visible(self, now: float) -> None:
+        lines = tuple(self._marquees[row].window(now) if row in self._marquees else line
+                      for row, line in enumerate(self._lines))
+        self._next_scroll = min((marquee.next_change(now) for marquee in self._marquees.values()), default=math.inf)
+        self._draw(lines)
+
+    def _show(self, *lines: str) -> None:
+        """Show the lines, the ones wider than the display scroll.
+        The width is taken after the fallbacks of the display ('…' -> '...') are put in"""
+        now = time.time()
+        width = self._display.columns
+        marquees = {}
+        for row, line in enumerate(lines):
+            cells = self._display.expand(line)
+            if len(cells) <= width:
+                continue
+            marquee = self._marquees.get(row)
+            if marquee is None or marquee.text != cells:
+                marquee = Marquee(cells, width, now, self.SCROLL_SPEED, self.SCROLL_PAUSE)
+            marquees[row] = marquee
+
+        self._marquees = marquees
+        self._lines = lines
+        self._draw_visible(now)
+
+    def _draw(self, lines: tuple[str, ...]) -> None:
+        self._frame = self._display.make_frame(lines)
 
     @abstractmethod
     def apply(self, last_mode: "Mode"):
@@ -23,105 +87,116 @@ class ClockMode(Mode):
         super().__init__(display)
         self._last_update = 0
 
-    def print_date(self):
-        self._display.print_line_endl(datetime.now().strftime("%d.%m.%Y"))
+    def apply(self, last_mode: Mode):
+        now = datetime.now()
+        if now.minute != self._last_update or not isinstance(last_mode, ClockMode):
+            self._show(*self._lines_at(now))
+            self._last_update = now.minute
+            # the next minute is then taken from the frame cache
+            self._display.make_frame(self._lines_at(now + timedelta(minutes=1)))
 
-    def print_clock(self):
-        self._display.print_line_endl(datetime.now().strftime("%H:%M"))
+    @staticmethod
+    def _lines_at(moment: datetime) -> tuple[str, str]:
+        return moment.strftime("%d.%m.%Y"), moment.strftime("%H:%M")
 
-    def apply(self, last_mode: Mode):
-        minutes = datetime.now().minute
-        if minutes != self._last_update or not isinstance(last_mode, ClockMode):
-            self._display.clear()
-            self.print_date()
-            self.print_clock()
-            self._last_update = minutes
+    def next_deadline(self, now: float) -> float:
+        return (now // 60 + 1) * 60
 
 
 class WeatherMode(Mode):
-    def __init__(self, display: Display, weather_service: WeatherService):
+    def __init__(self, display: Display, weather: Optional[BackgroundRefresher[dict]], stale_after: float = 3 * 3600,
+                 missing: str = "Нет api key"):
         super().__init__(display)
-        self._weather_service = weather_service
+        self._weather = weather
+        self._stale_after = stale_after
+        self._missing = missing
         self._last_update = None
 
     def apply(self, last_mode: Mode):
-        if self._weather_service is None:
-            self._display.clear()
-            self._display.print_line_endl("Нет api key")
+        if self._weather is None:
+            self._show(self._missing)
             return
 
-        if ((self._last_update is not None and self._last_update != datetime.now().date())
-                or not isinstance(last_mode, WeatherMode)):
+        snapshot = self._weather.get()
+        stale = snapshot is not None and snapshot.is_stale(self._stale_after)
+        state = (snapshot, stale, self._weather.last_error is not None)
+        # the previous city of CityRotationMode is a WeatherMode as well
+        if state == self._last_update and last_mode is self:
+            return
+        self._last_update = state
 
-            try:
-                data = self._weather_service.get_weather()
-            except requests.RequestException:
-                self._display.clear()
-                self._display.print_line_endl("Ошибка API")
-                return
+        if snapshot is None:
+            self._show("Ошибка API" if self._weather.last_error else "Загрузка...")
+            return
 
-            temperature = data["temperature"]
-            city = data["city"]
+        data = snapshot.value
+        self._show(_mark_stale(data["city"], stale), f"{data['temperature']}° {data['description']}")
 
-            self._display.clear()
-            self._display.print_line_endl(city)
-            self._display.print_line_endl(str(temperature))
+    def next_deadline(self, now: float) -> float:
+        deadline = super().next_deadline(now)
+        snapshot = self._weather.get() if self._weather is not None else None
+        if snapshot is not None and not snapshot.is_stale(self._stale_after):
+            deadline = min(deadline, snapshot.fetched_at + self._stale_after)
+        return deadline
 
 
 class SunMode(Mode):
-    def __init__(self, display: Display, sun_service: SunService, change_period: int = 4):
+    def __init__(self, display: Display, sun: Optional[BackgroundRefresher[dict]], change_period: int = 4,
+                 stale_after: float = 24 * 3600):
         super().__init__(display)
-        self._sun_service = sun_service
+        self._sun = sun
         self._last_update = None
         self._change_period = change_period
+        self._stale_after = stale_after
         self._last_mode = 0
 
-    def _print_sunrise(self, data):
+    def _print_sunrise(self, data, stale: bool):
         sunrise = datetime.fromisoformat(data["sunrise"])
         sunset = datetime.fromisoformat(data["sunset"])
 
-        self._display.print_line_endl(f"Восход: {sunrise.time().strftime("%H:%M")}")
-        self._display.print_line_endl(f"Закат: {sunset.time().strftime("%H:%M")}")
+        self._show(_mark_stale(f"Восход: {sunrise.strftime('%H:%M')}", stale), f"Закат: {sunset.strftime('%H:%M')}")
 
-    def _print_day_stats(self, data):
+    def _print_day_stats(self, data, stale: bool):
         delta_day_length = int(data["day_length"]) - int(data["day_length_past"])
 
         minutes = (delta_day_length % 3600) // 60
         if delta_day_length > 0:
-            self._display.print_line_endl(f"День больше на {minutes}мин")
-            self._display.print_line_endl("чем неделю назад")
+            self._show(f"День больше на {minutes}мин", _mark_stale("чем неделю назад", stale))
         else:
-            self._display.print_line_endl(f"День короче на {minutes}мин")
-            self._display.print_line_endl("чем неделю назад")
+            self._show(f"День короче на {minutes}мин", _mark_stale("чем неделю назад", stale))
 
     def apply(self, last_mode: Mode):
-        if self._sun_service is None:
-            self._display.print_line_endl("Сервис не доступен")
+        if self._sun is None:
+            self._show("Сервис не доступен")
             return
 
         if not isinstance(last_mode, SunMode):
             self._last_mode = 0
 
         now = time.time()
-        if ((self._last_update is not None and self._last_update + self._change_period < now)
+        if ((self._last_update is not None and self._last_update + self._change_period <= now)
                 or not isinstance(last_mode, SunMode)):
 
-            try:
-                data = self._sun_service.get_sun_info()
-            except requests.RequestException:
-                self._display.clear()
-                self._display.print_line_endl("Ошибка API")
+            snapshot: Optional[Snapshot[dict]] = self._sun.get()
+            if snapshot is None:
+                self._show("Ошибка API" if self._sun.last_error else "Загрузка...")
+                self._last_update = now
                 return
 
-            self._display.clear()
+            stale = snapshot.is_stale(self._stale_after)
             if self._last_mode % 2:
-                self._print_day_stats(data)
+                self._print_day_stats(snapshot.value, stale)
             else:
-                self._print_sunrise(data)
+                self._print_sunrise(snapshot.value, stale)
 
             self._last_update = now
             self._last_mode += 1
 
+    def next_deadline(self, now: float) -> float:
+        if self._sun is None or self._last_update is None:
+            return super().next_deadline(now)
+        return self._last_update + self._change_period
+
 
 class AutoSwitchMode(Mode):
     def __init__(self, display: Display, modes: Dict[str, Mode], change_period: int = 10):
@@ -137,13 +212,13 @@ class AutoSwitchMode(Mode):
     def apply(self, last_mode: Mode):
         now = time.time()
 
-        if not isinstance(last_mode, AutoSwitchMode):
+        if last_mode is not self:
             self._current_mode = self._modes.get(self._modes_index[0])
             self._last_mode_index = 0
             self._last_update = 0
             self._last_mode = self._modes.get(self._modes_index[-1])
 
-        if self._last_update + self._change_period < now:
+        if self._last_update + self._change_period <= now:
             self._last_mode_index += 1
             self._last_update = now
 
@@ -152,5 +227,36 @@ class AutoSwitchMode(Mode):
             self._last_mode = self._current_mode
             self._current_mode = self._modes.get(self._modes_index[self._last_mode_index % size])
 
-        self._current_mode.apply(self._last_mode)
+        frame = self._current_mode.update(self._last_mode)
+        if frame is not None:
+            self._frame = frame
         self._last_mode = self._current_mode
+
+    def next_deadline(self, now: float) -> float:
+        return min(self._last_update + self._change_period, self._current_mode.deadline(now))
+
+
+class CityRotationMode(AutoSwitchMode):
+    """The weather of the cities in turn. Every city is read from the same batched refresher,
+    so the rotation itself makes no requests"""
+
+    def __init__(self, display: Display, cities: Mapping[int, RefresherView[dict]], change_period: int = 10):
+        modes: Dict[str, Mode] = {str(city): WeatherMode(display, weather) for city, weather in cities.items()}
+        super().__init__(display, modes or {"": WeatherMode(display, None, missing="Нет городов")}, change_period)
+
+
+def _auto_switch(context: ModeContext) -> AutoSwitchMode:
+    registry = context.registry
+    modes = {key: registry.get(key) for key in (AppMode.CLOCK, AppMode.WEATHER, AppMode.SUN)}
+    return AutoSwitchMode(context.display, modes)
+
+
+BUILTIN_MODES = (
+    ModeSpec(AppMode.CLOCK.value, "Clock", lambda context: ClockMode(context.display)),
+    ModeSpec(AppMode.WEATHER.value, "Weather",
+             lambda context: WeatherMode(context.display, context.services.get(WEATHER_SERVICE))),
+    ModeSpec(AppMode.SUN.value, "Sun", lambda context: SunMode(context.display, context.services.get(SUN_SERVICE))),
+    ModeSpec(AppMode.AUTO_SWITCH.value, "AutoSwitch", _auto_switch),
+    ModeSpec(AppMode.CITIES.value, "Cities",
+             lambda context: CityRotationMode(context.display, context.services.get(CITIES_SERVICE))),
+)
@@ -0,0 +1,70 @@
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Phase:
+    name: str
+    seconds: float
+    modules: int  # modules imported during the phase
+    milestone: bool = False  # seconds are counted from the start of the profiler
+
+
+class StartupProfiler:
+    """Time and imported modules of every startup phase.\n
+    A disabled profiler records nothing, phases and marks cost one check"""
+
+    def __init__(self, enabled: bool = False) -> None:
+        self._enabled = enabled
+        self._started = time.perf_counter()
+        self._start_modules = len(sys.modules)
+        self._lock = threading.Lock()
+        self._phases: list[Phase] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if not self._enabled:
+            yield
+            return
+
+        modules = len(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(Phase(name, time.perf_counter() - started, len(sys.modules) - modules))
+
+    def mark(self, name: str) -> None:
+        """Record a milestone, the time since the profiler was created"""
+        if self._enabled:
+            self._add(Phase(name, time.perf_counter() - self._started, len(sys.modules) - self._start_modules, True))
+
+    def phases(self) -> list[Phase]:
+        with self._lock:
+            return list(self._phases)
+
+    def format(self) -> str:
+        lines = []
+        for phase in self.phases():
+            prefix = "@ " if phase.milestone else ""
+            lines.append(f"{prefix}{phase.name}: {phase.seconds * 1000:.1f}ms, +{phase.modules} модулей")
+        return "\n".join(lines)
+
+    def report(self) -> None:
+        if self._enabled:
+            logger.info("Запуск:\n%s", self.format())
+
+    def _add(self, phase: Phase) -> None:
+        with self._lock:
+            self._phases.append(phase)
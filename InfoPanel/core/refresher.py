@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, List, Optional, TypeVar
+
+from InfoPanel.core.metrics import METRICS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class Snapshot(Generic[T]):
+    value: T
+    fetched_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def is_stale(self, threshold: float) -> bool:
+        return self.age > threshold
+
+
+class BackgroundRefresher(Generic[T]):
+    """Calls a slow fetch function on its own thread every ttl seconds.
+    Readers always get the last good value at once, never waiting for the fetch.
+    An initial snapshot (e.g. from the disk cache) is served until it is ttl seconds old."""
+
+    def __init__(self, name: str, fetch: Callable[[], T], ttl: float, retry: float = 60.0,
+                 initial: Optional[Snapshot[T]] = None, metrics: MetricsRegistry = METRICS) -> None:
+        self._name = name
+        self._refresh_time = metrics.histogram(f"refresher.{name}.refresh_seconds")
+        self._errors = metrics.counter(f"refresher.{name}.errors")
+        self._fetch = fetch
+        self._ttl = ttl
+        self._retry = retry
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Snapshot[T]] = initial
+        self._last_error: Optional[Exception] = None
+        self._listeners: List[Callable[[], None]] = []
+        self._generation = 0
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def last_error(self) -> Optional[Exception]:
+        with self._lock:
+            return self._last_error
+
+    def get(self) -> Optional[Snapshot[T]]:
+        with self._lock:
+            return self._snapshot
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """Call the listener after every refresh attempt, e.g. to wake the panel"""
+        self._listeners.append(listener)
+
+    def replace(self, fetch: Callable[[], T], initial: Optional[Snapshot[T]] = None) -> None:
+        """Switch to another source (e.g. a new city). The old value is dropped,
+        a fetch of the old source still running is ignored"""
+        with self._lock:
+            self._fetch = fetch
+            self._generation += 1
+            self._snapshot = initial
+            self._last_error = None
+        self._notify()
+
+    def refresh(self) -> bool:
+        with self._lock:
+            fetch, generation = self._fetch, self._generation
+        try:
+            with self._refresh_time.time():
+                value = fetch()
+        except Exception as e:
+            logger.warning("Не удалось обновить %s: %s", self._name, e)
+            self._errors.inc()
+            with self._lock:
+                if generation == self._generation:
+                    self._last_error = e
+            self._notify()
+            return False
+
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._snapshot = Snapshot(value, time.time())
+            self._last_error = None
+        self._notify()
+        return True
+
+    def _notify(self) -> None:
+        for listener in self._listeners:
+            listener()
+
+    def first_delay(self) -> float:
+        """Seconds until the first refresh: a fresh initial snapshot is served until it is ttl seconds old"""
+        snapshot = self.get()
+        return self._ttl - snapshot.age if snapshot is not None and snapshot.age < self._ttl else 0.0
+
+    def refresh_once(self) -> float:
+        """Refresh and return the seconds until the next refresh"""
+        return self._ttl if self.refresh() else self._retry
+
+    def start(self, stop_event: threading.Event) -> None:
+        delay = self.first_delay()
+        while not stop_event.wait(delay):
+            delay = self.refresh_once()
+
+
+class DirectSource(Generic[T]):
+    """A value read anew on every get(), read like a refresher. For sources that are cheap to read
+    and change on their own, e.g. the sun data of today from the local table: there is no ttl
+    to outlive the day"""
+
+    def __init__(self, name: str, read: Callable[[], T]) -> None:
+        self._name = name
+        self._read = read
+        self._last_error: Optional[Exception] = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def last_error(self) -> Optional[Exception]:
+        return self._last_error
+
+    def get(self) -> Optional[Snapshot[T]]:
+        try:
+            value = self._read()
+        except Exception as e:
+            logger.warning("Не удалось прочитать %s: %s", self._name, e)
+            self._last_error = e
+            return None
+        self._last_error = None
+        return Snapshot(value, time.time())
+
+    def replace(self, read: Callable[[], T], initial: Optional[Snapshot[T]] = None) -> None:
+        """Switch to another source, like BackgroundRefresher.replace(). The initial value is not needed"""
+        self._read = read
+
+
+class RefresherView(Generic[T]):
+    """A part of the value of a refresher, read like a refresher of its own.
+    Several views share one fetch, e.g. the cities of one batched weather request"""
+
+    def __init__(self, source: BackgroundRefresher, select: Callable[[Any], Optional[T]]) -> None:
+        self._source = source
+        self._select = select
+
+    @property
+    def source(self) -> BackgroundRefresher:
+        return self._source
+
+    @property
+    def last_error(self) -> Optional[Exception]:
+        return self._source.last_error
+
+    def get(self) -> Optional[Snapshot[T]]:
+        snapshot = self._source.get()
+        if snapshot is None:
+            return None
+        value = self._select(snapshot.value)
+        return Snapshot(value, snapshot.fetched_at) if value is not None else None
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from InfoPanel.core.commands import CommandBus, CommandListener
+from InfoPanel.core.info_panel import InfoPanel
+from InfoPanel.core.refresher import BackgroundRefresher
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncRuntime:
+    """Runs the panels, the command queue, the refreshers and the periodic jobs on one asyncio loop
+    instead of a thread each. Nothing polls: a panel sleeps until its mode's deadline or a wake,
+    the command task until a command arrives.\n
+    Blocking work (building frames, API fetches, file checks) runs on an executor. The serial writes
+    are left to the writer thread of every display, where the first frame of a new mode cancels the frame
+    being written; apart from those only the targets added with add_thread() (the pystray loop)
+    keep a thread of their own.
+
+    It is not faster than the thread runtime: a mode switch waits for the frame's wire time either way
+    (benchmarks/bench_runtime.py: p50 27 ms on both). What it saves is the idle wake-ups of the command
+    thread, 0.03% CPU down to 0.001%, and it takes about 1 ms longer to shut down"""
+
+    def __init__(self, max_workers: Optional[int] = None) -> None:
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="infopanel")
+        self._thread_stop = threading.Event()
+        self._jobs: list[Callable[[], Awaitable[None]]] = []
+        self._threads: list[Callable[[threading.Event], None]] = []
+        self._buses: list[CommandBus] = []
+        self._tasks: set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    def add_panel(self, panel: InfoPanel) -> None:
+        self._jobs.append(lambda: self._panel(panel))
+
+    def add_refresher(self, refresher: BackgroundRefresher) -> None:
+        self._jobs.append(lambda: self._refresher(refresher))
+
+    def add_periodic(self, job: Callable[[], object], period: float) -> None:
+        self._jobs.append(lambda: self._periodic(job, period))
+
+    def add_commands(self, bus: CommandBus, listener: CommandListener) -> None:
+        self._buses.append(bus)
+        self._jobs.append(lambda: self._commands(bus, listener))
+
+    def add_thread(self, target: Callable[[threading.Event], None]) -> None:
+        """A target that needs its own thread, called like a ThreadManager target"""
+        self._threads.append(target)
+
+    def spawn_panel(self, panel: InfoPanel) -> None:
+        """Start a panel on the running loop, from any thread"""
+        if self._loop is None:
+            self.add_panel(panel)
+        else:
+            self._call(lambda: self._start(self._panel(panel)))
+
+    def spawn_refresher(self, refresher: BackgroundRefresher) -> None:
+        """Start a refresher built on first use, from any thread"""
+        if self._loop is None:
+            self.add_refresher(refresher)
+        else:
+            self._call(lambda: self._start(self._refresher(refresher)))
+
+    def stop(self) -> None:
+        """Stop the loop, from any thread"""
+        self._call(lambda: self._stop.set())
+
+    def run(self) -> None:
+        asyncio.run(self._main())
+
+    async def _main(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop.set_default_executor(self._executor)
+        self._stop = asyncio.Event()
+        for bus in self._buses:
+            bus.attach(self._loop)
+        for job in self._jobs:
+            self._start(job())
+        for target in self._threads:
+            threading.Thread(target=target, args=(self._thread_stop,), daemon=True).start()
+
+        await self._stop.wait()
+
+        self._thread_stop.set()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self, coroutine: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Задача остановлена с ошибкой", exc_info=task.exception())
+
+    def _call(self, callback: Callable[[], None]) -> None:
+        if self._loop is None:
+            raise RuntimeError("Цикл событий не запущен")
+        try:
+            self._loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            logger.debug("Цикл событий уже остановлен")
+
+    async def _blocking(self, function: Callable[[], T]) -> T:
+        return await self._loop.run_in_executor(None, function)
+
+    @staticmethod
+    async def _sleep(event: asyncio.Event, timeout: float) -> None:
+        """Sleep until the timeout expires or the event is set"""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _panel(self, panel: InfoPanel) -> None:
+        wake = asyncio.Event()
+        panel.add_wake_listener(lambda: self._call(wake.set))
+        await self._blocking(panel.begin)
+        while not panel.stopped:
+            wake.clear()
+            await self._sleep(wake, await self._blocking(panel.tick))
+        await self._blocking(panel.end)
+
+    async def _refresher(self, refresher: BackgroundRefresher) -> None:
+        delay = refresher.first_delay()
+        while True:
+            await asyncio.sleep(delay)
+            delay = await self._blocking(refresher.refresh_once)
+
+    async def _periodic(self, job: Callable[[], object], period: float) -> None:
+        while True:
+            await asyncio.sleep(period)
+            await self._blocking(job)
+
+    async def _commands(self, bus: CommandBus, listener: CommandListener) -> None:
+        while True:
+            command = await bus.receive_async()
+            if not listener.handle(command):
+                self._stop.set()
+                return
@@ -1,9 +1,17 @@
 import json
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, tzinfo
 from pathlib import Path
 import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from InfoPanel.core.cache import ResponseCache
+from InfoPanel.core.http_client import HttpClient
+from InfoPanel.core.solar import SolarTable
+
+# a COM port or a network serial server
+PORT_PATTERN = re.compile(r"COM\d+|tcp://[\w.\-]+:\d+")
 
-import requests
 
 class SettingsService:
     __FILE = Path("Setting.json")
@@ -12,6 +20,13 @@ class SettingsService:
         self.com_port = None
         self.city = None
         self.api_key = None
+        self.displays = []
+        self.baudrate = None
+        self.cities = []
+
+    @property
+    def path(self) -> Path:
+        return self.__FILE
 
     def change_settings(self, com_port : str, city : str, api_key : str):
         self.com_port = com_port
@@ -41,12 +56,19 @@ class SettingsService:
             self.city = weather.get("city")
             self.api_key = weather.get("api_key")
 
-            if com_port is None or self.city is None or self.api_key is None or re.fullmatch(r"COM\d+", com_port) is None:
+            if com_port is None or self.city is None or self.api_key is None or PORT_PATTERN.fullmatch(com_port) is None:
                 return False
 
             self.com_port = data.get("com_port")
             self.city = weather.get("city")
             self.api_key = weather.get("api_key")
+            baudrate = data.get("baudrate")
+            self.baudrate = baudrate if isinstance(baudrate, int) and baudrate > 0 else None
+            self.cities = [city for city in weather.get("cities", []) if isinstance(city, int)]
+            self.displays = [
+                display for display in data.get("displays", [])
+                if PORT_PATTERN.fullmatch(str(display.get("com_port"))) is not None
+            ]
 
             return True
 
@@ -58,27 +80,64 @@ class SettingsService:
                 "city": self.city
             }
         }
+        if self.cities:
+            data["weather"]["cities"] = self.cities
+        if self.baudrate:
+            data["baudrate"] = self.baudrate
+        if self.displays:
+            data["displays"] = self.displays
         with open(self.__FILE, "w", encoding="utf-8") as file:
             json.dump(data, file, indent=4)
 
 
+def _weather(data: dict) -> dict:
+    """Weather dictionary of one OpenWeatherMap current weather response"""
+    return {
+        "city": data["name"],
+        "temperature": data["main"]["temp"],
+        "feels_like": data["main"]["feels_like"],
+        "humidity": data["main"]["humidity"],
+        "description": data["weather"][0]["description"],
+        "wind_speed": data["wind"]["speed"]
+    }
+
 
 class WeatherService:
     """Class Service for retrieving and caching weather data from OpenWeatherMap API"""
     __URL = "https://api.openweathermap.org/data/2.5/weather"
+    CACHE_TTL = 3 * 60 * 60
 
-    def __init__(self, api_key : str, city : str = "Samara"):
+    def __init__(self, api_key : str, city : str = "Samara", cache : Optional[ResponseCache] = None,
+                 http : Optional[HttpClient] = None, url : Optional[str] = None):
         """
         Initialize WeatherService.
 
         :param api_key: OpenWeatherMap API key.
         :param city: City name for weather requests.
+        :param cache: Disk cache that keeps responses between restarts.
+        :param http: Shared HTTP session, a private one is created if omitted.
+        :param url: API endpoint, overrides the OpenWeatherMap URL (e.g. a local stand-in server).
         """
         self.__api_key = api_key
         self.__city = city
+        self.__cache = cache
+        self.__http = http or HttpClient()
+        self.__url = url or self.__URL
         self.__data = None
         self.__last_update = None
 
+    def __cache_key(self) -> str:
+        return ResponseCache.key("weather", self.__city, datetime.now().date())
+
+    def cached_weather(self) -> Optional[Tuple[dict, float]]:
+        """Get weather data stored on disk without a request.
+
+        :return: Weather data and the time it was fetched, None if there is no valid entry.
+        """
+        if self.__cache is None:
+            return None
+        return self.__cache.get(self.__cache_key())
+
     def get_weather(self) -> dict:
         """Get current weather data. Weather data is cached and updated once per day.
 
@@ -93,11 +152,22 @@ class WeatherService:
             }
         :raises requests.RequestException: If the HTTP request fails.
         """
-        if self.__data is not None or (self.__last_update is not None and self.__last_update != datetime.now().date()):
+        if self.__data is not None and self.__last_update == datetime.now().date():
             return self.__data
-        else:
+
+        cached = self.cached_weather()
+        if cached is not None:
+            self.__data = cached[0]
             self.__last_update = datetime.now().date()
+            return self.__data
+        return self.fetch_weather()
+
+    def fetch_weather(self) -> dict:
+        """Request current weather data from the API, bypassing the cache.
 
+        :return: Dictionary with weather information, same as get_weather().
+        :raises requests.RequestException: If the HTTP request fails.
+        """
         params = {
             "q": self.__city,
             "appid": self.__api_key,
@@ -105,36 +175,127 @@ class WeatherService:
             "lang": "ru"
         }
 
-        response = requests.get(self.__URL, params=params, timeout=10)
-        response.raise_for_status()
-
-        data = response.json()
-        self.__data = {
-            "city": data["name"],
-            "temperature": data["main"]["temp"],
-            "feels_like": data["main"]["feels_like"],
-            "humidity": data["main"]["humidity"],
-            "description": data["weather"][0]["description"],
-            "wind_speed": data["wind"]["speed"]
-        }
+        self.__data = _weather(self.__http.get_json(self.__url, params))
+        self.__last_update = datetime.now().date()
+        if self.__cache is not None:
+            self.__cache.put(self.__cache_key(), self.__data, self.CACHE_TTL)
         return self.__data
 
+
+class CityWeatherService:
+    """Class Service for retrieving and caching the weather of several cities
+    with one request to the OpenWeatherMap group endpoint"""
+    __URL = "https://api.openweathermap.org/data/2.5/group"
+    CACHE_TTL = WeatherService.CACHE_TTL
+    GROUP_SIZE = 20  # city IDs the API takes in one request
+
+    def __init__(self, api_key : str, cities : Sequence[int], cache : Optional[ResponseCache] = None,
+                 http : Optional[HttpClient] = None, url : Optional[str] = None):
+        """
+        Initialize CityWeatherService.
+
+        :param api_key: OpenWeatherMap API key.
+        :param cities: OpenWeatherMap city IDs, in the order they are shown.
+        :param cache: Disk cache that keeps the weather of every city between restarts.
+        :param http: Shared HTTP session, a private one is created if omitted.
+        :param url: API endpoint, overrides the OpenWeatherMap URL (e.g. a local stand-in server).
+        """
+        self.__api_key = api_key
+        self.__cities = list(cities)
+        self.__cache = cache
+        self.__http = http or HttpClient()
+        self.__url = url or self.__URL
+
+    @property
+    def cities(self) -> List[int]:
+        return list(self.__cities)
+
+    @staticmethod
+    def __cache_key(city : int) -> str:
+        return ResponseCache.key("weather", f"id{city}", datetime.now().date())
+
+    def cached_weather(self) -> Optional[Tuple[Dict[int, dict], float]]:
+        """Get the weather of every city stored on disk without a request.
+
+        :return: Weather data by city ID and the time the oldest city was fetched,
+            None if any city has no valid entry.
+        """
+        if self.__cache is None:
+            return None
+        data = {}
+        fetched_at = None
+        for city in self.__cities:
+            cached = self.__cache.get(self.__cache_key(city))
+            if cached is None:
+                return None
+            data[city] = cached[0]
+            fetched_at = cached[1] if fetched_at is None else min(fetched_at, cached[1])
+        return data, fetched_at
+
+    def fetch_weather(self) -> Dict[int, dict]:
+        """Request the weather of all cities from the API, one request per GROUP_SIZE cities.
+
+        :return: Weather data by city ID, each like WeatherService.get_weather().
+            A city the API does not know is left out.
+        :raises requests.RequestException: If any of the HTTP requests fails.
+        """
+        groups = [self.__cities[i:i + self.GROUP_SIZE] for i in range(0, len(self.__cities), self.GROUP_SIZE)]
+        responses = self.__http.get_json_many([
+            (self.__url, {
+                "id": ",".join(str(city) for city in group),
+                "appid": self.__api_key,
+                "units": "metric",
+                "lang": "ru"
+            })
+            for group in groups
+        ])
+
+        found = {item["id"]: _weather(item) for response in responses for item in response["list"]}
+        data = {city: found[city] for city in self.__cities if city in found}
+        if self.__cache is not None:
+            self.__cache.put_many({self.__cache_key(city): weather for city, weather in data.items()},
+                                  self.CACHE_TTL)
+        return data
+
+
 class SunService:
     """Class Service for retrieving and caching sun data."""
     __URL = "https://api.sunrise-sunset.org/json"
-    def __init__(self, time_zone: str = "Samara", lat : float = 53.1835, lng : float = 50.1182):
+    CACHE_TTL = 24 * 60 * 60
+
+    def __init__(self, time_zone: str = "Samara", lat : float = 53.1835, lng : float = 50.1182,
+                 cache : Optional[ResponseCache] = None, http : Optional[HttpClient] = None, url : Optional[str] = None):
         self.__time_zone = time_zone
         self.__lat = lat
         self.__lng = lng
+        self.__cache = cache
+        self.__http = http or HttpClient()
+        self.__url = url or self.__URL
         self.__data = None
         self.__last_update = None
 
+    def __cache_key(self) -> str:
+        return ResponseCache.key("sun", f"{self.__lat},{self.__lng}", datetime.now().date())
+
+    def cached_sun_info(self) -> Optional[Tuple[dict, float]]:
+        """Return sun data stored on disk for today and the time it was fetched, without a request"""
+        if self.__cache is None:
+            return None
+        return self.__cache.get(self.__cache_key())
+
     def get_sun_info(self):
-        if self.__data is not None or (self.__last_update is not None and self.__last_update != datetime.now().date()):
+        if self.__data is not None and self.__last_update == datetime.now().date():
             return self.__data
-        else:
+
+        cached = self.cached_sun_info()
+        if cached is not None:
+            self.__data = cached[0]
             self.__last_update = datetime.now().date()
+            return self.__data
+        return self.fetch_sun_info()
 
+    def fetch_sun_info(self):
+        """Request sun data for today and a week ago from the API, bypassing the cache"""
         params_now = {
             "lat": self.__lat,
             "lng": self.__lng,
@@ -150,14 +311,10 @@ class SunService:
             "tzid": f"Europe/{self.__time_zone}"
         }
 
-        response_now = requests.get(self.__URL, params=params_now, timeout=10)
-        response_now.raise_for_status()
-        response_week_past = requests.get(self.__URL, params=params_week_past, timeout=10)
-        response_week_past.raise_for_status()
-
-
-        data_now = response_now.json()
-        data_week_past = response_week_past.json()
+        data_now, data_week_past = self.__http.get_json_many([
+            (self.__url, params_now),
+            (self.__url, params_week_past),
+        ])
 
         self.__data = {
             "sunrise": data_now["results"]["sunrise"],
@@ -165,9 +322,50 @@ class SunService:
             "day_length": data_now["results"]["day_length"],
             "day_length_past": data_week_past["results"]["day_length"]
         }
+        self.__last_update = datetime.now().date()
+        if self.__cache is not None:
+            self.__cache.put(self.__cache_key(), self.__data, self.CACHE_TTL)
         return self.__data
 
 
+def _zone(time_zone : str) -> tzinfo:
+    """The Europe/<time_zone> zone the sunrise-sunset API is asked for, the local zone
+    of the computer if the time zone database does not have it (Windows without tzdata)"""
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+    try:
+        return ZoneInfo(f"Europe/{time_zone}")
+    except (ZoneInfoNotFoundError, ValueError):
+        return datetime.now().astimezone().tzinfo
+
+
+class SolarService:
+    """Class Service computing sun data locally with the NOAA solar equations instead of asking the API.
+    Gives the same data as SunService, without network, waiting or API errors"""
+
+    def __init__(self, time_zone: str = "Samara", lat : float = 53.1835, lng : float = 50.1182):
+        self.__zone = _zone(time_zone)
+        self.__lat = lat
+        self.__lng = lng
+        self.__table: Optional[SolarTable] = None
+
+    def cached_sun_info(self) -> Tuple[dict, float]:
+        """Sun data for today and the time it was computed, like SunService.cached_sun_info()"""
+        return self.get_sun_info(), time.time()
+
+    def get_sun_info(self) -> dict:
+        """Sun data for today, same as SunService.get_sun_info(). The days of the year
+        are computed together on the first call of the year, every other call is a lookup"""
+        today = datetime.now(self.__zone).date()
+        if self.__table is None or not self.__table.covers(today):
+            self.__table = SolarTable.for_year(self.__lat, self.__lng, self.__zone, today.year)
+        return self.__table.sun_info(today)
+
+    def fetch_sun_info(self) -> dict:
+        """Same as get_sun_info(), there is nothing to fetch"""
+        return self.get_sun_info()
+
+
 if __name__ == "__main__":
     service = SunService()
 
@@ -0,0 +1,100 @@
+import math
+from datetime import date, datetime, timedelta, tzinfo
+from typing import Dict, List, Tuple
+
+# altitude of the sun's centre at sunrise and sunset: refraction and the radius of the disc
+SUNRISE_ZENITH = 90.833
+UNIX_EPOCH = date(1970, 1, 1).toordinal()
+JULIAN_OFFSET = 1721424.5  # Julian day of 0h UTC of date.toordinal() == 0
+PAST_DAYS = 7  # day_length_past is the day length a week ago
+
+
+def _position(jd: float) -> Tuple[float, float]:
+    """Declination of the sun (radians) and the equation of time (minutes) at the Julian day,
+    the equations of the NOAA solar calculator"""
+    t = (jd - 2451545.0) / 36525.0
+    mean_long = math.radians((280.46646 + t * (36000.76983 + t * 0.0003032)) % 360)
+    anomaly = math.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+    eccentricity = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+    centre = math.radians(math.sin(anomaly) * (1.914602 - t * (0.004817 + 0.000014 * t))
+                          + math.sin(2 * anomaly) * (0.019993 - 0.000101 * t)
+                          + math.sin(3 * anomaly) * 0.000289)
+    omega = math.radians(125.04 - 1934.136 * t)
+    apparent_long = mean_long + centre - math.radians(0.00569 + 0.00478 * math.sin(omega))
+    obliquity = math.radians(23 + (26 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60) / 60
+                             + 0.00256 * math.cos(omega))
+
+    declination = math.asin(math.sin(obliquity) * math.sin(apparent_long))
+    y = math.tan(obliquity / 2) ** 2
+    equation_of_time = 4 * math.degrees(
+        y * math.sin(2 * mean_long)
+        - 2 * eccentricity * math.sin(anomaly)
+        + 4 * eccentricity * y * math.sin(anomaly) * math.cos(2 * mean_long)
+        - 0.5 * y * y * math.sin(4 * mean_long)
+        - 1.25 * eccentricity * eccentricity * math.sin(2 * anomaly))
+    return declination, equation_of_time
+
+
+def _hour_angle(lat: float, declination: float) -> float:
+    """Hour angle of sunrise in degrees, 0 during the polar night and 180 during the polar day"""
+    cos_angle = (math.cos(math.radians(SUNRISE_ZENITH)) / (math.cos(lat) * math.cos(declination))
+                 - math.tan(lat) * math.tan(declination))
+    return math.degrees(math.acos(min(1.0, max(-1.0, cos_angle))))
+
+
+def _event(jd: float, lat: float, lng: float, minutes: float, sign: int) -> float:
+    """Minutes after 0h UTC of sunrise (sign -1) or sunset (sign 1), the sun's position
+    taken at the estimated time of the event"""
+    declination, equation_of_time = _position(jd + minutes / 1440)
+    return 720 - 4 * lng - equation_of_time + sign * 4 * _hour_angle(lat, declination)
+
+
+def sun_times(day: date, lat: float, lng: float) -> Tuple[float, float]:
+    """Sunrise and sunset of the day as Unix timestamps.
+    During the polar night both are at solar noon, during the polar day they are 24 hours apart"""
+    jd = day.toordinal() + JULIAN_OFFSET
+    lat_rad = math.radians(lat)
+    declination, equation_of_time = _position(jd + 0.5 - lng / 360)
+    noon = 720 - 4 * lng - equation_of_time
+    hours = 4 * _hour_angle(lat_rad, declination)
+    sunrise, sunset = noon - hours, noon + hours
+    if 0 < hours < 720:
+        sunrise = _event(jd, lat_rad, lng, sunrise, -1)
+        sunset = min(max(_event(jd, lat_rad, lng, sunset, 1), sunrise), sunrise + 1440)
+    midnight = (day.toordinal() - UNIX_EPOCH) * 86400
+    return midnight + sunrise * 60, midnight + sunset * 60
+
+
+class SolarTable:
+    """Sun data of every day from first on, for one location, computed in one pass.
+    sun_info() of a day in the table is a list lookup"""
+
+    def __init__(self, lat: float, lng: float, zone: tzinfo, first: date, days: int) -> None:
+        self._first = first.toordinal()
+        self._days: List[Dict[str, object]] = []
+
+        times = [sun_times(first + timedelta(days=offset), lat, lng) for offset in range(-PAST_DAYS, days)]
+        for index in range(PAST_DAYS, len(times)):
+            sunrise, sunset = times[index]
+            sunrise_past, sunset_past = times[index - PAST_DAYS]
+            self._days.append({
+                "sunrise": datetime.fromtimestamp(round(sunrise), zone).isoformat(),
+                "sunset": datetime.fromtimestamp(round(sunset), zone).isoformat(),
+                "day_length": round(sunset - sunrise),
+                "day_length_past": round(sunset_past - sunrise_past),
+            })
+
+    @classmethod
+    def for_year(cls, lat: float, lng: float, zone: tzinfo, year: int) -> "SolarTable":
+        first = date(year, 1, 1)
+        return cls(lat, lng, zone, first, (date(year + 1, 1, 1) - first).days)
+
+    def covers(self, day: date) -> bool:
+        return 0 <= day.toordinal() - self._first < len(self._days)
+
+    def sun_info(self, day: date) -> Dict[str, object]:
+        """Same dictionary as SunService.get_sun_info(): sunrise and sunset as ISO strings
+        in the time zone of the table, the day length today and a week ago in seconds"""
+        if not self.covers(day):
+            raise KeyError(f"{day.isoformat()} вне таблицы")
+        return self._days[day.toordinal() - self._first]
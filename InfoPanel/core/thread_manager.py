@@ -15,9 +15,15 @@ class ThreadManager:
         )
         self._threads.append(thread)
 
+    def spawn(self, target: Callable[[threading.Event], None], *, daemon: bool = True) -> None:
+        """Add a thread and start it at once, for work that appears after run()"""
+        self.add(target, daemon=daemon)
+        self._threads[-1].start()
+
     def start_all(self) -> None:
         for t in self._threads:
-            t.start()
+            if t.ident is None:  # not spawned already
+                t.start()
 
     def join_all(self) -> None:
         for t in self._threads:
@@ -0,0 +1,45 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FileWatcher:
+    """Calls on_change when the modification time or the size of a file changes.
+    One stat() per period, so it works the same on every platform and in the frozen exe"""
+
+    def __init__(self, path: Path, on_change: Callable[[], None], period: float = 2.0) -> None:
+        self._path = path
+        self._on_change = on_change
+        self._period = period
+        self._signature = self._stat()
+
+    @property
+    def period(self) -> float:
+        return self._period
+
+    def _stat(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = os.stat(self._path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        """Call on_change if the file changed since the last check"""
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            self._on_change()
+        except Exception:
+            logger.exception("Не удалось применить изменения %s", self._path)
+        return True
+
+    def start(self, stop_event: threading.Event) -> None:
+        while not stop_event.wait(self._period):
+            self.check()
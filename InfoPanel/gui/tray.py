@@ -1,12 +1,14 @@
+import logging
 import os
 import sys
 import threading
+from typing import Mapping
 
 from PIL import Image
 from pystray import Icon, MenuItem, Menu
 
 from InfoPanel.core.commands import CommandBus
-from InfoPanel.core.mode_registry import AppMode
+from InfoPanel.core.metrics import METRICS, MetricsRegistry
 
 if getattr(sys, 'frozen', False):
     _base_dir = os.path.dirname(sys.executable)
@@ -15,17 +17,17 @@ else:
 
 ICON_PATH = os.path.join(_base_dir, 'icon.ico')
 
+logger = logging.getLogger(__name__)
+
 
 class TrayIcon:
-    _MENU_LABELS = {
-        AppMode.CLOCK:       "Clock",
-        AppMode.WEATHER:     "Weather",
-        AppMode.SUN:         "Sun",
-        AppMode.AUTO_SWITCH: "AutoSwitch",
-    }
-
-    def __init__(self, bus: CommandBus) -> None:
+    _NOTIFY_LIMIT = 250
+
+    def __init__(self, bus: CommandBus, labels: Mapping[str, str], metrics: MetricsRegistry = METRICS) -> None:
+        """labels: menu label of every mode by mode name, from the mode registry"""
         self._bus = bus
+        self._labels = dict(labels)
+        self._metrics = metrics
         self._icon = self._build_icon()
 
     def _make_handler(self, command: str):
@@ -33,6 +35,11 @@ class TrayIcon:
             self._bus.send(command)
         return handler
 
+    def _on_metrics(self, icon, item) -> None:
+        text = self._metrics.format()
+        logger.info("Метрики:\n%s", text)
+        icon.notify(text[:self._NOTIFY_LIMIT] or "Нет данных", "Метрики")
+
     def _on_exit(self, icon, item) -> None:
         self._bus.send("exit")
         icon.stop()
@@ -41,14 +48,14 @@ class TrayIcon:
         image = Image.open(ICON_PATH)
 
         mode_items = [
-            MenuItem(label, self._make_handler(mode.value))
-            for mode, label in self._MENU_LABELS.items()
+            MenuItem(label, self._make_handler(mode))
+            for mode, label in self._labels.items()
         ]
 
         return Icon(
             "InfoPanelCOM",
             image,
-            menu=Menu(*mode_items, MenuItem("Exit", self._on_exit)),
+            menu=Menu(*mode_items, MenuItem("Metrics", self._on_metrics), MenuItem("Exit", self._on_exit)),
         )
 
     def run(self, stop_event: threading.Event) -> None:
@@ -1,4 +1,17 @@
-from app import App
+import logging
+import os
+import sys
+
+from InfoPanel.core.profiling import StartupProfiler
+
+PROFILE_FLAG = "--profile-startup"
+PROFILE_ENV = "INFOPANEL_PROFILE_STARTUP"
+ASYNC_FLAG = "--async"
+ASYNC_ENV = "INFOPANEL_ASYNC"
 
 if __name__ == "__main__":
-    App().start()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    profiler = StartupProfiler(enabled=PROFILE_FLAG in sys.argv[1:] or bool(os.environ.get(PROFILE_ENV)))
+    with profiler.phase("import app"):
+        from app import App
+    App(profiler, use_async=ASYNC_FLAG in sys.argv[1:] or bool(os.environ.get(ASYNC_ENV))).start()
@@ -0,0 +1,78 @@
+"""Weather of several cities against the local stand-in API.
+
+Compares a WeatherService per city (one request and one quota unit per city) with one
+CityWeatherService asking the group endpoint for all of them, then runs CityRotationMode
+through every city on a fake clock and counts the requests the rotation makes.
+
+Run from the repository root: python -m benchmarks.bench_cities
+"""
+import time
+
+from display_helper import DisplayWithBuffer
+from display_transport import MemoryTransport
+from InfoPanel.core.http_client import HttpClient
+from InfoPanel.core.metrics import MetricsRegistry
+from InfoPanel.core.modes import CityRotationMode
+from InfoPanel.core.refresher import BackgroundRefresher, RefresherView
+from InfoPanel.core.services import CityWeatherService, WeatherService
+from benchmarks.fake_api import FakeApiServer
+from benchmarks.fake_clock import FakeClock, patch_clock
+
+FIRST_CITY = 524901
+ROUNDS = 5
+
+
+def _measure(server: FakeApiServer, refresh) -> tuple[float, float]:
+    requests = server.requests
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        refresh()
+    per_refresh = (time.perf_counter() - started) / ROUNDS * 1000
+    return per_refresh, (server.requests - requests) / ROUNDS
+
+
+def _rotate(server: FakeApiServer, http: HttpClient, cities: list[int]) -> tuple[int, int]:
+    """Show every city once. Returns the requests made and the cities seen on the display"""
+    service = CityWeatherService("key", cities, http=http, url=f"{server.base_url}/group")
+    refresher = BackgroundRefresher("cities", service.fetch_weather, 3600, metrics=MetricsRegistry())
+    refresher.refresh()
+    display = DisplayWithBuffer(MemoryTransport("cities"))
+    mode = CityRotationMode(display, {city: RefresherView(refresher, lambda weather, city=city: weather.get(city))
+                                      for city in cities})
+
+    requests = server.requests
+    seen = set()
+    with patch_clock(FakeClock(time.time())) as clock:
+        last_mode = None
+        end = clock.time() + len(cities) * 60
+        while len(seen) < len(cities) and clock.time() < end:
+            frame = mode.update(last_mode)
+            if frame is not None:
+                display.show(frame)
+                seen.update(city for city in cities if f"City {city}".encode() in display.buffer.snapshot())
+            last_mode = mode
+            clock.advance_to(mode.deadline(clock.time()))
+    display.close()
+    return server.requests - requests, len(seen)
+
+
+def main(delay: float = 0.05) -> None:
+    print(f"{'cities':>6} {'per city ms':>12} {'requests':>9} {'group ms':>9} {'requests':>9} "
+          f"{'rotation requests':>18} {'shown':>6}")
+    with FakeApiServer(delay=delay) as server:
+        http = HttpClient()
+        for count in (4, 12, 40):
+            cities = list(range(FIRST_CITY, FIRST_CITY + count))
+            singles = [WeatherService("key", str(city), http=http, url=f"{server.base_url}/weather") for city in cities]
+            group = CityWeatherService("key", cities, http=http, url=f"{server.base_url}/group")
+
+            single_ms, single_requests = _measure(server, lambda: [service.fetch_weather() for service in singles])
+            group_ms, group_requests = _measure(server, group.fetch_weather)
+            rotation_requests, shown = _rotate(server, http, cities)
+            print(f"{count:>6} {single_ms:>12.1f} {single_requests:>9.0f} {group_ms:>9.1f} {group_requests:>9.0f} "
+                  f"{rotation_requests:>18} {shown:>6}")
+        http.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Command-to-glass latency of bursts of tray clicks.
+
+One panel with its writer thread on a fake 9600 baud port that, like a real port in
+non-blocking mode, takes every write at once and sends it out of its driver buffer.
+Every burst clicks through the modes CLICKS times, CLICK_GAP apart, and reports the time
+from the last click to the last byte on the wire (the glass), the writes and bytes per burst
+and the frames cancelled while being written, and checks that the bytes on the wire leave
+the screen the panel thinks it shows. Run once like before (everything handed to the driver,
+no coalescing, a mode switch queued behind the old frames) and once with the driver kept OUTPUT_AHEAD ahead of the wire,
+coalescing and preemption. The target is InfoPanel.SWITCH_TARGET.
+
+Run from the repository root: python -m benchmarks.bench_commands
+"""
+import statistics
+import threading
+import time
+from typing import List
+
+from display_helper import DisplayWithBuffer, Frame, RenderResult
+from InfoPanel.core.commands import CommandBus, CommandListener, EXIT_COMMAND
+from InfoPanel.core.info_panel import InfoPanel
+from InfoPanel.core.metrics import MetricsRegistry
+from InfoPanel.core.mode_registry import AppMode, ModeRegistry
+from InfoPanel.core.modes import ClockMode, SunMode, WeatherMode
+from InfoPanel.core.refresher import BackgroundRefresher, Snapshot
+from benchmarks.fake_serial import FakeSerial, patch_serial
+from benchmarks.run import SUN, WEATHER
+
+BURSTS = 20
+CLICKS = 6
+CLICK_GAP = 0.005
+QUIET = 0.15
+MODES = (AppMode.WEATHER.value, AppMode.SUN.value, AppMode.CLOCK.value)
+
+
+class _QueuedDisplay(DisplayWithBuffer):
+    """A mode switch waits behind the frames already queued, like before preemption"""
+
+    def show(self, frame: Frame, preempt: bool = False) -> RenderResult:
+        return super().show(frame)
+
+
+def _glass(port: FakeSerial, rows: int, columns: int) -> bytes:
+    """Replay the bytes the port sent on a rows x columns screen"""
+    screen = [bytearray(b" " * columns) for _ in range(rows)]
+    data = b"".join(port.writes)
+    row = column = index = 0
+    while index < len(data):
+        byte = data[index]
+        if byte == 0x0C:
+            screen = [bytearray(b" " * columns) for _ in range(rows)]
+            row = column = 0
+        elif byte == 0x1F and data[index + 1] == 0x24:
+            column, row = data[index + 2] - 1, data[index + 3] - 1
+            index += 3
+        elif byte == 0x1B:
+            index += {0x40: 1, 0x74: 2, 0x52: 2, 0x25: 2}[data[index + 1]]
+        elif column < columns:
+            screen[row][column] = byte
+            column += 1
+        index += 1
+    return b"".join(bytes(line) for line in screen)
+
+
+def _wait_quiet(display: DisplayWithBuffer, port: FakeSerial) -> None:
+    written = -1
+    while written != len(port.writes) or display.writer_stats().queue_depth or time.monotonic() < port.glass_at:
+        written = len(port.writes)
+        time.sleep(QUIET)
+
+
+def _run(label: str, display_type: type, coalesce: bool, output_ahead: bool) -> None:
+    metrics = MetricsRegistry()
+    weather = BackgroundRefresher("weather", lambda: WEATHER, ttl=3600, initial=Snapshot(WEATHER, time.time()),
+                                  metrics=metrics)
+    sun = BackgroundRefresher("sun", lambda: SUN, ttl=3600, initial=Snapshot(SUN, time.time()), metrics=metrics)
+    with patch_serial(realtime=True, buffered=True):
+        display = display_type("BENCH")
+        port = FakeSerial.instances[0]
+    display.start_writer()
+    if not output_ahead:
+        display.transport.output_ahead = None
+    registry = ModeRegistry()
+    registry.register(AppMode.CLOCK, ClockMode(display))
+    registry.register(AppMode.WEATHER, WeatherMode(display, weather))
+    registry.register(AppMode.SUN, SunMode(display, sun))
+    panel = InfoPanel(display, registry, metrics)
+    bus = CommandBus(metrics, coalesce=coalesce)
+    stop_event = threading.Event()
+    threading.Thread(target=panel.start, args=(stop_event,), daemon=True).start()
+    threading.Thread(target=CommandListener(bus, panel).start, args=(stop_event,), daemon=True).start()
+    panel.first_frame.wait(5.0)
+    _wait_quiet(display, port)
+
+    latencies: List[float] = []
+    writes = 0
+    written = 0
+    for burst in range(BURSTS):
+        before = len(port.writes)
+        for click in range(CLICKS):
+            bus.send(MODES[(burst + click) % len(MODES)])
+            time.sleep(CLICK_GAP)
+        last_click = time.monotonic() - CLICK_GAP
+        _wait_quiet(display, port)
+        latencies.append(port.glass_at - last_click)
+        writes += len(port.writes) - before
+        written += sum(len(data) for data in port.writes[before:])
+
+    glass_ok = _glass(port, display.buffer.rows, display.buffer.columns) == display.buffer.snapshot()
+    cancelled = display.writer_stats().cancelled
+    bus.send(EXIT_COMMAND)
+    stop_event.wait(1.0)
+    display.close()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<22} {statistics.median(latencies) * 1000:>8.1f} {p95 * 1000:>8.1f} "
+          f"{writes / BURSTS:>8.1f} {written / BURSTS:>8.0f} {cancelled:>9} "
+          f"{'yes' if glass_ok else 'NO':>7} {'yes' if p95 <= InfoPanel.SWITCH_TARGET else 'no':>9}")
+
+
+def main() -> None:
+    print(f"{'bus':<22} {'p50 ms':>8} {'p95 ms':>8} {'writes':>8} {'bytes':>8} {'cancelled':>9} {'screen':>7} "
+          f"{'<= ' + str(int(InfoPanel.SWITCH_TARGET * 1000)) + 'ms':>9}")
+    _run("before", _QueuedDisplay, coalesce=False, output_ahead=False)
+    _run("coalesced, preempting", DisplayWithBuffer, coalesce=True, output_ahead=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Micro-benchmark of the text encoder against the per-fragment str.encode dispatch it replaced.
+
+Run from the repository root: python -m benchmarks.bench_encoding
+"""
+import timeit
+
+from display_encoding import encoder_for
+
+FRAGMENTS = [
+    "18.10.2026",
+    "12:30",
+    "Восход: 07:12",
+    "Закат: 17:48",
+    "День больше на 12мин",
+    "чем неделю назад",
+    "Samara",
+    "-3.5",
+]
+
+
+def legacy_encode(code: str, text: str) -> bytes:
+    if code == "RU":
+        return text.encode('cp866')
+    elif code == "JP":
+        return text.encode('shift_jis')
+    elif code == "EU":
+        return text.encode('ascii')
+    return b''
+
+
+def _run(label: str, encode, number: int) -> float:
+    seconds = timeit.timeit(lambda: [encode(text) for text in FRAGMENTS], number=number)
+    per_fragment = seconds / (number * len(FRAGMENTS)) * 1e9
+    print(f"{label:<10} {per_fragment:8.1f} ns/fragment")
+    return per_fragment
+
+
+def main(number: int = 100_000) -> None:
+    encoder = encoder_for("RU")
+    legacy = _run("legacy", lambda text: legacy_encode("RU", text), number)
+    compiled = _run("compiled", encoder.encode, number)
+    print(f"ratio      {compiled / legacy:8.2f}x")
+
+    mixed = "Ёлка «5°» — ok…"
+    try:
+        legacy_encode("EU", mixed)
+    except UnicodeEncodeError as e:
+        print(f"legacy EU  fails: {e.reason}")
+    print(f"compiled EU {encoder_for('EU').encode(mixed)!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Serial bytes spent on user-defined characters with the resident glyph cache
+against downloading every glyph on every frame.
+
+An hour of a 1 fps screen with a degree sign, a weather icon and a bar graph
+of 5 levels that moves every frame, for 8 and for 4 device slots.
+
+Run from the repository root: python -m benchmarks.bench_glyphs
+"""
+from display_glyphs import GLYPHS
+from display_helper import DisplayWithBuffer
+from benchmarks.fake_serial import FakeSerial, patch_serial
+
+FRAMES = 3600
+
+
+def _frame_glyphs(index: int) -> list:
+    level = index % 5 + 1
+    icon = "sun" if (index // 600) % 2 else "cloud"
+    return ["degree", icon, f"bar{level}"]
+
+
+def _run(slots: bytes) -> None:
+    display = DisplayWithBuffer("BENCH", glyph_slots=slots)
+    port = FakeSerial.instances[-1]
+    port.reset_counters()
+
+    uncached = 0
+    for index in range(FRAMES):
+        names = _frame_glyphs(index)
+        uncached += sum(len(GLYPHS[name].command(slots[0])) for name in names)
+        with display.frame():
+            for name in names:
+                display.glyph(name)
+
+    stats = display.glyph_stats()
+    print(f"{len(slots):>5} {stats.hit_rate:>9.1%} {stats.evictions:>10} {port.bytes_written:>12} {uncached:>14}")
+
+
+def main() -> None:
+    print(f"{'slots':>5} {'hit rate':>9} {'evictions':>10} {'glyph bytes':>12} {'always upload':>14}")
+    with patch_serial():
+        for slots in (b"`{|}~^_\\", b"`{|}"):
+            _run(slots)
+
+
+if __name__ == "__main__":
+    main()
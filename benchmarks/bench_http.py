@@ -0,0 +1,49 @@
+"""Sun and weather refresh latency against the local stand-in API.
+
+Compares one request at a time on fresh connections (the old requests.get path)
+with the pooled HttpClient running independent requests concurrently.
+
+Run from the repository root: python -m benchmarks.bench_http
+"""
+import time
+
+import requests
+
+from InfoPanel.core.http_client import HttpClient
+from InfoPanel.core.services import SunService, WeatherService
+from benchmarks.fake_api import FakeApiServer
+
+
+def _sequential_sun(url: str) -> None:
+    for params in ({"lat": 53.1835}, {"lat": 53.1835, "date": "2026-10-11"}):
+        response = requests.get(url, params=params, timeout=10)
+        response.raise_for_status()
+        response.json()
+
+
+def _measure(label: str, refresh, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        refresh()
+    per_refresh = (time.perf_counter() - started) / rounds * 1000
+    print(f"{label:<22} {per_refresh:8.1f} ms/refresh")
+    return per_refresh
+
+
+def main(delay: float = 0.05, rounds: int = 20) -> None:
+    with FakeApiServer(delay=delay) as server:
+        http = HttpClient()
+        sun = SunService(http=http, url=f"{server.base_url}/sun")
+        weather = WeatherService("key", http=http, url=f"{server.base_url}/weather")
+
+        sequential = _measure("sun, sequential", lambda: _sequential_sun(f"{server.base_url}/sun"), rounds)
+        connections = server.connections
+        pooled = _measure("sun, pooled parallel", sun.fetch_sun_info, rounds)
+        _measure("weather, pooled", weather.fetch_weather, rounds)
+        print(f"speedup                {sequential / pooled:8.2f}x")
+        print(f"connections opened     sequential {connections}, pooled {server.connections - connections}")
+        http.close()
+
+
+if __name__ == "__main__":
+    main()
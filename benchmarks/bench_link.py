@@ -0,0 +1,52 @@
+"""Link negotiation against fake devices and the wire time per frame it saves.
+
+The negotiation part opens a display on a fake device set to each supported rate
+and checks which rate is verified. The throughput part takes the bytes per frame
+of every benchmarks.run scenario and prices them at 9600 baud and at the fastest rate.
+
+Run from the repository root: python -m benchmarks.bench_link
+"""
+from display_helper import DisplayWithBuffer
+from display_link import SUPPORTED_BAUDRATES
+from benchmarks import run
+from benchmarks.fake_serial import BITS_PER_BYTE, FakeSerial, patch_serial
+
+SLOW = 9600
+
+
+def _negotiation() -> None:
+    print(f"{'device':>8} {'verified':>9} {'probes':>7}")
+    for device_rate in SUPPORTED_BAUDRATES:
+        with patch_serial(device_baudrate=device_rate):
+            display = DisplayWithBuffer("BENCH")
+            port = FakeSerial.instances[-1]
+            port.reset_counters()
+            rate = display.negotiate_baudrate()
+            probes = sum(1 for data in port.writes if data == b"\x10\x04\x01")
+        print(f"{device_rate:>8} {str(rate):>9} {probes:>7}")
+    with patch_serial(device_baudrate=0):
+        print(f"{'silent':>8} {str(DisplayWithBuffer('BENCH').negotiate_baudrate()):>9}")
+
+
+def _ms_per_frame(bytes_per_frame: float, rate: int) -> float:
+    return bytes_per_frame * BITS_PER_BYTE / rate * 1000
+
+
+def _throughput() -> None:
+    fast = max(SUPPORTED_BAUDRATES)
+    print(f"\n{'scenario':<34}{'bytes':>8}{f'{SLOW} ms':>12}{f'{fast} ms':>12}{'gain':>8}")
+    for scenario, values in run.run().items():
+        size = values["bytes_per_frame"]
+        if not size:
+            continue
+        slow, quick = _ms_per_frame(size, SLOW), _ms_per_frame(size, fast)
+        print(f"{scenario:<34}{size:>8g}{slow:>12.2f}{quick:>12.3f}{slow / quick:>7.0f}x")
+
+
+def main() -> None:
+    _negotiation()
+    _throughput()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Startup cost of the mode registry with many installed modes.
+
+Builds the registries of DISPLAYS panels with the built-in modes and PLUGINS more
+installed ones, each needing its own service (a table of PLUGIN_TABLE bytes, standing
+in for an API client or a font). Reports the time, the memory allocated and the modes and
+services built when every mode is built up front, like before, and when modes are built
+on first use, at startup (clock on every display) and after one panel selects weather.
+
+Run from the repository root: python -m benchmarks.bench_modes
+"""
+import time
+import tracemalloc
+from typing import List, Tuple
+
+from display_helper import DisplayWithBuffer
+from display_transport import MemoryTransport
+from InfoPanel.core.container import Container
+from InfoPanel.core.mode_registry import AppMode, ModeContext, ModeRegistry, ModeSpec
+from InfoPanel.core.modes import BUILTIN_MODES, CITIES_SERVICE, SUN_SERVICE, WEATHER_SERVICE, Mode
+from InfoPanel.core.refresher import BackgroundRefresher, Snapshot
+from InfoPanel.core.metrics import MetricsRegistry
+from benchmarks.run import SUN, WEATHER
+
+DISPLAYS = 4
+PLUGINS = 40
+PLUGIN_TABLE = 64 * 1024
+
+
+class _PluginMode(Mode):
+    def __init__(self, context: ModeContext, service: str) -> None:
+        super().__init__(context.display)
+        self._table = context.services.get(service)
+
+    def apply(self, last_mode: Mode):
+        self._show("plugin", str(len(self._table)))
+
+
+def _plugin(index: int) -> Tuple[ModeSpec, str]:
+    service = f"plugin{index}.table"
+    return ModeSpec(f"plugin{index}", f"Plugin {index}", lambda context: _PluginMode(context, service)), service
+
+
+def _services(plugin_services: List[str]) -> Container:
+    services = Container()
+    metrics = MetricsRegistry()
+    services.register(WEATHER_SERVICE, lambda _: BackgroundRefresher(
+        "weather", lambda: WEATHER, 3600, initial=Snapshot(WEATHER, time.time()), metrics=metrics))
+    services.register(SUN_SERVICE, lambda _: BackgroundRefresher(
+        "sun", lambda: SUN, 3600, initial=Snapshot(SUN, time.time()), metrics=metrics))
+    services.register(CITIES_SERVICE, lambda _: {})  # no cities configured
+    for service in plugin_services:
+        services.register(service, lambda _: bytearray(PLUGIN_TABLE))
+    return services
+
+
+def _startup(eager: bool, select_weather: bool) -> Tuple[float, int, int, int]:
+    plugins = [_plugin(index) for index in range(PLUGINS)]
+    specs = list(BUILTIN_MODES) + [spec for spec, _ in plugins]
+    displays = [DisplayWithBuffer(MemoryTransport(f"display{index}")) for index in range(DISPLAYS)]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    services = _services([service for _, service in plugins])
+    registries = []
+    for display in displays:
+        registry = ModeRegistry(display, services, specs)
+        registry.get(AppMode.CLOCK)
+        if eager:
+            for name in registry.names():
+                registry.get(name)
+        registries.append(registry)
+    if select_weather:
+        registries[0].get(AppMode.WEATHER)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    modes = sum(len(registry.built()) for registry in registries)
+    return elapsed, peak, modes, len(services.built())
+
+
+def main() -> None:
+    print(f"{DISPLAYS} displays, {len(BUILTIN_MODES)} built-in + {PLUGINS} installed modes")
+    print(f"{'registry':<24} {'ms':>8} {'KiB':>8} {'modes':>6} {'services':>9}")
+    for label, eager, select_weather in (("eager (before)", True, False),
+                                         ("lazy, startup", False, False),
+                                         ("lazy, weather selected", False, True)):
+        elapsed, peak, modes, services = _startup(eager, select_weather)
+        print(f"{label:<24} {elapsed * 1000:>8.2f} {peak / 1024:>8.0f} {modes:>6} {services:>9}")
+
+
+if __name__ == "__main__":
+    main()
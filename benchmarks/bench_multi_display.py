@@ -0,0 +1,98 @@
+"""Scaling of one InfoPanel process over many fake serial ports.
+
+Every port gets its own DisplayWithBuffer, writer thread and InfoPanel thread, all panels
+share one refresher like the app does. The first port can be stalled to check that a
+slow port never holds back the others.
+
+Run from the repository root: python -m benchmarks.bench_multi_display
+"""
+import threading
+import time
+from statistics import mean
+
+from display_helper import DisplayWithBuffer
+from InfoPanel.core.info_panel import InfoPanel, PanelGroup
+from InfoPanel.core.metrics import MetricsRegistry
+from InfoPanel.core.mode_registry import AppMode, ModeRegistry
+from InfoPanel.core.modes import Mode, WeatherMode
+from InfoPanel.core.refresher import BackgroundRefresher, Snapshot
+from benchmarks.fake_serial import FakeSerial, patch_serial
+from benchmarks.run import WEATHER
+
+TICK = 0.05
+
+
+class CounterMode(Mode):
+    """Changes a digit every tick, so every tick produces a frame"""
+
+    def __init__(self, display, weather: BackgroundRefresher) -> None:
+        super().__init__(display)
+        self._weather = weather
+        self._counter = 0
+
+    def apply(self, last_mode: Mode):
+        self._counter += 1
+        snapshot = self._weather.get()
+        self._show(snapshot.value["city"], str(self._counter))
+
+    def next_deadline(self, now: float) -> float:
+        return now + TICK
+
+
+def _run(ports: int, stall: float, duration: float) -> dict:
+    weather = BackgroundRefresher("weather", lambda: WEATHER, ttl=3600, initial=Snapshot(WEATHER, time.time()),
+                                  metrics=MetricsRegistry())
+    with patch_serial(realtime=True):
+        panels = []
+        for index in range(ports):
+            display = DisplayWithBuffer(f"COM{index + 1}")
+            display.start_writer()
+            registry = ModeRegistry()
+            registry.register(AppMode.CLOCK, CounterMode(display, weather))
+            registry.register(AppMode.WEATHER, WeatherMode(display, weather))
+            panels.append((InfoPanel(display, registry, MetricsRegistry(), name=f"COM{index + 1}"), display))
+        fakes = list(FakeSerial.instances)
+
+    fakes[0].stall = stall
+    group = PanelGroup([panel for panel, _ in panels])
+    stop_event = threading.Event()
+    threads = [threading.Thread(target=panel.start, args=(stop_event,), daemon=True) for panel, _ in panels]
+
+    cpu_started = time.process_time()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop_event.set()
+    group.wake()
+    for thread in threads:
+        thread.join()
+    cpu = time.process_time() - cpu_started
+
+    stats = [display.writer_stats() for _, display in panels]
+    fast = stats[1:] if stall and ports > 1 else stats
+    for _, display in panels:
+        display.close()
+
+    return {
+        "ports": ports,
+        "fast_written_fps": mean(s.written for s in fast) / duration,
+        "fast_write_ms": mean(s.avg_latency for s in fast) * 1000,
+        "stalled_written": stats[0].written if stall else None,
+        "stalled_dropped_merged": stats[0].dropped + stats[0].merged if stall else None,
+        "cpu_per_port_ms": cpu / ports * 1000,
+    }
+
+
+def main(duration: float = 2.0) -> None:
+    print(f"{'ports':>6} {'stall':>6} {'fast fps':>9} {'write ms':>9} {'stalled wr':>11} {'coalesced':>10} {'cpu/port ms':>12}")
+    for ports in (1, 4, 16, 48):
+        for stall in (0.0, 1.0):
+            if stall and ports == 1:
+                continue
+            r = _run(ports, stall, duration)
+            print(f"{ports:>6} {stall:>6.1f} {r['fast_written_fps']:>9.1f} {r['fast_write_ms']:>9.2f} "
+                  f"{str(r['stalled_written']):>11} {str(r['stalled_dropped_merged']):>10} {r['cpu_per_port_ms']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Recovery of a display whose USB-serial adapter drops for a while.
+
+A counter is rendered every 50 ms through the background writer on a realtime
+fake 9600 baud port. The adapter is unplugged after 1 s and plugged back 0.8 s later.
+Reports the time from plugging back to reopening the port, bounded by the reconnect backoff,
+the time from reopening to the resync landing on the glass, compared with the wire time
+of one full frame, and the recorded link stats.
+
+Run from the repository root: python -m benchmarks.bench_reconnect
+"""
+import time
+
+from display_helper import DisplayWithBuffer
+from benchmarks.fake_serial import FakeSerial, patch_serial
+
+PERIOD = 0.05
+UNPLUG_AT = 1.0
+PLUG_AT = 1.8
+DURATION = 3.0
+
+
+def main() -> None:
+    with patch_serial(realtime=True):
+        display = DisplayWithBuffer("BENCH")
+        display.start_writer()
+        display.transport.output_ahead = None  # the resync goes out in one write, as it is measured
+        started = time.monotonic()
+        plugged_at = None
+        frame = 0
+
+        while (elapsed := time.monotonic() - started) < DURATION:
+            if UNPLUG_AT <= elapsed < PLUG_AT:
+                FakeSerial.unplugged.add("BENCH")
+            elif FakeSerial.unplugged:
+                FakeSerial.unplugged.clear()
+                plugged_at = time.monotonic()
+            display.render_frame((f"frame {frame}", "reconnect bench"))
+            display.check_link()
+            frame += 1
+            time.sleep(PERIOD)
+
+        display.close()
+        port = FakeSerial.instances[-1]
+        resync = port.writes[0] if port.writes else b""
+        full_frame = port.wire_time(len(display.make_frame(("frame 00", "reconnect bench")).payload))
+        reopened = port.opened_at - plugged_at if plugged_at else float("nan")
+        restored = port.write_times[0] + port.wire_time(len(resync)) - port.opened_at if resync else float("nan")
+
+    stats = display.link_stats()
+    print(f"ports opened          {len(FakeSerial.instances)}")
+    print(f"reconnects            {stats.reconnects}")
+    print(f"downtime              {stats.downtime * 1000:.0f} ms (unplugged {(PLUG_AT - UNPLUG_AT) * 1000:.0f} ms)")
+    print(f"resync size           {len(resync)} bytes")
+    print(f"plug to reopen        {reopened * 1000:.1f} ms (backoff cap {display.RECONNECT_MAX_DELAY * 1000:.0f} ms)")
+    print(f"reopen to glass       {restored * 1000:.1f} ms")
+    print(f"full frame wire time  {full_frame * 1000:.1f} ms")
+    print(f"screen after resync   {bytes(display.buffer.row(0)).decode('cp866').rstrip()!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Thread runtime against the asyncio runtime on the same panels.
+
+Two panels on realtime fake 9600 baud ports share one command bus, as in the app.
+For each runtime reports the CPU used while idle (clock mode, nothing to draw),
+the latency from sending a mode command to the whole new frame being on the glass of the first
+port (end of the wire time of its last byte, the target is 50 ms) and the time from the exit command
+to the runtime returning.
+
+Run from the repository root: python -m benchmarks.bench_runtime
+"""
+import statistics
+import threading
+import time
+from typing import Callable, List, Tuple
+
+from display_helper import DisplayWithBuffer
+from InfoPanel.core.commands import CommandBus, CommandListener, EXIT_COMMAND
+from InfoPanel.core.info_panel import InfoPanel, PanelGroup
+from InfoPanel.core.metrics import MetricsRegistry, MetricsReporter
+from InfoPanel.core.mode_registry import AppMode, ModeRegistry
+from InfoPanel.core.modes import ClockMode, WeatherMode
+from InfoPanel.core.refresher import BackgroundRefresher, Snapshot
+from InfoPanel.core.runtime import AsyncRuntime
+from InfoPanel.core.thread_manager import ThreadManager
+from benchmarks.fake_serial import FakeSerial, patch_serial
+from benchmarks.run import WEATHER
+
+PANELS = 2
+IDLE = 10.0
+SWITCHES = 40
+SWITCH_PERIOD = 0.15
+QUIET = 0.05  # no write for this long: the frame is complete
+
+
+def _panels() -> Tuple[List[InfoPanel], FakeSerial]:
+    weather = BackgroundRefresher("weather", lambda: WEATHER, ttl=3600, initial=Snapshot(WEATHER, time.time()),
+                                  metrics=MetricsRegistry())
+    panels = []
+    with patch_serial(realtime=True):
+        for index in range(PANELS):
+            display = DisplayWithBuffer(f"COM{index + 1}")
+            display.start_writer()  # as the app does with both runtimes
+            registry = ModeRegistry()
+            registry.register(AppMode.CLOCK, ClockMode(display))
+            registry.register(AppMode.WEATHER, WeatherMode(display, weather))
+            panels.append(InfoPanel(display, registry, MetricsRegistry(), name=f"COM{index + 1}"))
+        port = FakeSerial.instances[0]
+    return panels, port
+
+
+def _threads(panels: List[InfoPanel], bus: CommandBus) -> Callable[[], None]:
+    threads = ThreadManager(threading.Event())
+    for panel in panels:
+        threads.add(panel.start)
+    threads.add(CommandListener(bus, PanelGroup(panels)).start)
+    threads.add(MetricsReporter(MetricsRegistry()).start)
+    return threads.run
+
+
+def _asyncio(panels: List[InfoPanel], bus: CommandBus) -> Callable[[], None]:
+    runtime = AsyncRuntime()
+    for panel in panels:
+        runtime.add_panel(panel)
+    runtime.add_commands(bus, CommandListener(bus, PanelGroup(panels)))
+    reporter = MetricsReporter(MetricsRegistry())
+    runtime.add_periodic(reporter.report, reporter.period)
+    return runtime.run
+
+
+def _switch_latency(bus: CommandBus, port: FakeSerial) -> List[float]:
+    latencies = []
+    for index in range(SWITCHES):
+        written = len(port.writes)
+        sent_at = time.monotonic()
+        bus.send(AppMode.WEATHER.value if index % 2 == 0 else AppMode.CLOCK.value)
+        while len(port.writes) <= written:
+            time.sleep(0.0005)
+        while time.monotonic() - port.write_times[-1] < QUIET:
+            time.sleep(0.001)
+        latencies.append(port.glass_at - sent_at)
+        time.sleep(SWITCH_PERIOD)
+    return latencies
+
+
+def _measure(label: str, build: Callable[[List[InfoPanel], CommandBus], Callable[[], None]]) -> None:
+    panels, port = _panels()
+    bus = CommandBus(MetricsRegistry())
+    runner = threading.Thread(target=build(panels, bus), daemon=True)
+    runner.start()
+    for panel in panels:
+        panel.first_frame.wait(5.0)
+    time.sleep(0.5)
+
+    cpu = time.process_time()
+    time.sleep(IDLE)
+    idle = (time.process_time() - cpu) / IDLE
+
+    latencies = _switch_latency(bus, port)
+
+    exit_at = time.perf_counter()
+    bus.send(EXIT_COMMAND)
+    runner.join(5.0)
+    shutdown = time.perf_counter() - exit_at
+
+    latencies.sort()
+    print(f"{label:<8} {idle * 100:>9.3f} {statistics.median(latencies) * 1000:>11.1f} "
+          f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>11.1f} {shutdown * 1000:>12.1f}")
+
+
+def main() -> None:
+    print(f"{'runtime':<8} {'idle CPU%':>9} {'switch p50':>11} {'switch p95':>11} {'shutdown ms':>12}")
+    _measure("threads", _threads)
+    _measure("asyncio", _asyncio)
+
+
+if __name__ == "__main__":
+    main()
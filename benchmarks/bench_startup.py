@@ -0,0 +1,47 @@
+"""Cold import of the InfoPanel app in fresh interpreters.
+
+Reports the median import time of InfoPanel/app.py over a few runs and which
+heavy dependencies the import pulled in. They should be none: tkinter is needed
+only for the first-run dialog, PIL and pystray only on the tray thread, requests
+only on the first fetch, asyncio only with the asyncio runtime.
+
+For the phases of a real start run the app with --profile-startup
+(or INFOPANEL_PROFILE_STARTUP=1).
+
+Run from the repository root: python -m benchmarks.bench_startup
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RUNS = 7
+HEAVY = ("tkinter", "PIL", "pystray", "requests", "urllib3", "asyncio")
+
+_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {HEAVY!r} if m in sys.modules]}}))
+"""
+
+
+def _probe() -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(ROOT), str(ROOT / "InfoPanel")]))
+    output = subprocess.run([sys.executable, "-c", _PROBE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+def main() -> None:
+    results = [_probe() for _ in range(RUNS)]
+    median = statistics.median(result["seconds"] for result in results)
+    print(f"import app    {median * 1000:.1f} ms (median of {RUNS})")
+    print(f"heavy modules {', '.join(results[0]['heavy']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Sun data computed locally (SolarService) against the sunrise-sunset API (SunService).
+
+Measures a SunService refresh against the local stand-in API and the first and every
+later SolarService call, then compares the computed sunrise, sunset and day length with
+the responses recorded in benchmarks/sun_responses.json. The recording names its source: the one in
+the repository was computed with the astral package, as the API could not be reached when it was made;
+--record replaces it with answers of the API.
+
+Run from the repository root:
+    python -m benchmarks.bench_sun               latency, and the comparison with the recording
+    python -m benchmarks.bench_sun --record      ask the real API for the 1st and 15th of every month
+                                                 of the year and store the responses (needs network)
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from InfoPanel.core.http_client import HttpClient
+from InfoPanel.core.services import SolarService, SunService
+from InfoPanel.core.solar import SolarTable
+from benchmarks.fake_api import FakeApiServer
+
+RECORDING = Path(__file__).with_name("sun_responses.json")
+API_URL = "https://api.sunrise-sunset.org/json"
+LAT, LNG, TZID = 53.1835, 50.1182, "Europe/Samara"  # the SunService defaults
+TOLERANCE = 60  # seconds
+
+
+def _latency(rounds: int = 20, delay: float = 0.05) -> None:
+    with FakeApiServer(delay=delay) as server:
+        http = HttpClient()
+        api = SunService(http=http, url=f"{server.base_url}/sun")
+        started = time.perf_counter()
+        for _ in range(rounds):
+            api.fetch_sun_info()
+        api_ms = (time.perf_counter() - started) / rounds * 1000
+        http.close()
+
+    solar = SolarService()
+    started = time.perf_counter()
+    solar.get_sun_info()
+    first_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    for _ in range(10000):
+        solar.get_sun_info()
+    lookup_us = (time.perf_counter() - started) / 10000 * 1e6
+
+    print(f"SunService, stand-in API ({delay * 1000:.0f} ms)  {api_ms:8.1f} ms/refresh, {server.requests // rounds} requests")
+    print(f"SolarService, first call        {first_ms:8.1f} ms (the table of the year)")
+    print(f"SolarService, later calls       {lookup_us:8.1f} us, 0 requests")
+
+
+def _record(path: Path, year: int) -> None:
+    days = [date(year, month, day) for month in range(1, 13) for day in (1, 15)]
+    http = HttpClient()
+    responses = http.get_json_many([
+        (API_URL, {"lat": LAT, "lng": LNG, "formatted": 0, "date": day.isoformat(), "tzid": TZID}) for day in days
+    ])
+    http.close()
+    recording = {
+        "source": API_URL,
+        "lat": LAT, "lng": LNG, "tzid": TZID,
+        "responses": [{"date": day.isoformat(), "results": response["results"]}
+                      for day, response in zip(days, responses)],
+    }
+    path.write_text(json.dumps(recording, indent=4), encoding="utf-8")
+    print(f"{len(days)} responses saved to {path}")
+
+
+def _compare(path: Path) -> bool:
+    if not path.exists():
+        print(f"no recording in {path}, run with --record to make one")
+        return True
+
+    recording = json.loads(path.read_text(encoding="utf-8"))
+    print(f"recording: {recording.get('source', 'unknown source')}")
+    zone = ZoneInfo(recording["tzid"])
+    tables = {}
+    worst = 0
+    print(f"{'date':<12} {'sunrise s':>10} {'sunset s':>10} {'length s':>10}")
+    for response in recording["responses"]:
+        day = date.fromisoformat(response["date"])
+        if day.year not in tables:
+            tables[day.year] = SolarTable.for_year(recording["lat"], recording["lng"], zone, day.year)
+        computed = tables[day.year].sun_info(day)
+        results = response["results"]
+        errors = [
+            (datetime.fromisoformat(computed["sunrise"]) - datetime.fromisoformat(results["sunrise"])).total_seconds(),
+            (datetime.fromisoformat(computed["sunset"]) - datetime.fromisoformat(results["sunset"])).total_seconds(),
+            computed["day_length"] - int(results["day_length"]),
+        ]
+        worst = max(worst, *(abs(error) for error in errors))
+        print(f"{day.isoformat():<12} {errors[0]:>10.0f} {errors[1]:>10.0f} {errors[2]:>10.0f}")
+    print(f"largest difference {worst:.0f} s, {'within' if worst <= TOLERANCE else 'OVER'} {TOLERANCE} s")
+    return worst <= TOLERANCE
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="store responses of the real API")
+    parser.add_argument("--year", type=int, default=date.today().year)
+    parser.add_argument("--recording", type=Path, default=RECORDING)
+    args = parser.parse_args()
+
+    if args.record:
+        _record(args.recording, args.year)
+        return
+    _latency()
+    if not _compare(args.recording):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
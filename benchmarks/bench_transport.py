@@ -0,0 +1,93 @@
+"""The unchanged display command layer over every transport.
+
+Renders the same frames through DisplayWithBuffer on the in-memory, pty and raw TCP
+transports (a local reader drains the pty and the socket) and on the serial transport
+over the fake 9600 baud port, then reports each transport's own stats and the cost
+of a non-blocking write_nowait().
+
+Run from the repository root: python -m benchmarks.bench_transport
+"""
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Callable, List, Tuple
+
+from display_helper import DisplayWithBuffer
+from display_transport import MemoryTransport, PtyTransport, TcpTransport, Transport, open_transport
+from benchmarks.fake_serial import patch_serial
+
+FRAMES = 2000
+
+
+def _drain(read: Callable[[], bytes], received: List[int]) -> None:
+    while True:
+        try:
+            data = read()
+        except OSError:
+            return
+        if not data:
+            return
+        received[0] += len(data)
+
+
+def _tcp_server() -> Tuple[TcpTransport, Callable[[], int]]:
+    server = socket.create_server(("127.0.0.1", 0))
+    received = [0]
+
+    def accept() -> None:
+        connection, _ = server.accept()
+        with connection:
+            _drain(lambda: connection.recv(65536), received)
+        server.close()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return TcpTransport("127.0.0.1", server.getsockname()[1]), lambda: received[0]
+
+
+def _pty() -> Tuple[PtyTransport, Callable[[], int]]:
+    transport = PtyTransport()
+    transport.open()
+    reader = os.open(transport.slave_name, os.O_RDONLY | os.O_NOCTTY)
+    received = [0]
+    threading.Thread(target=_drain, args=(lambda: os.read(reader, 65536), received), daemon=True).start()
+    return transport, lambda: received[0]
+
+
+def _run(label: str, transport: Transport, received: Callable[[], int]) -> None:
+    display = DisplayWithBuffer(transport)
+    started = time.perf_counter()
+    for frame in range(FRAMES):
+        display.render_frame((f"frame {frame:06d}", time.strftime("%H:%M:%S")))
+    elapsed = time.perf_counter() - started
+
+    nowait_started = time.perf_counter()
+    for _ in range(FRAMES):
+        transport.write_nowait(b"\x1F\x24\x01\x01frame")
+    nowait = (time.perf_counter() - nowait_started) / FRAMES
+    transport.drain(5.0)
+
+    stats = transport.stats()
+    time.sleep(0.05)
+    display.close()
+    print(f"{label:<8} {stats.writes:>7} {stats.bytes_written:>8} {received():>9} "
+          f"{stats.throughput / 1e6:>10.2f} {elapsed / FRAMES * 1e6:>10.1f} {nowait * 1e6:>10.2f}")
+
+
+def main() -> None:
+    print(f"{'link':<8} {'writes':>7} {'bytes':>8} {'received':>9} {'MB/s busy':>10} "
+          f"{'us/frame':>10} {'us/nowait':>10}")
+    memory = MemoryTransport("bench")
+    _run("memory", memory, lambda: len(memory.data))
+    if sys.platform != "win32":
+        _run("pty", *_pty())
+    _run("tcp", *_tcp_server())
+    with patch_serial():
+        serial_transport = open_transport("BENCH")
+        port = serial_transport.port
+        _run("serial", serial_transport, lambda: port.bytes_written)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Local stand-in for the weather and sunrise-sunset APIs.
+
+Serves canned JSON on 127.0.0.1 with an optional per-request delay, so the services
+can be exercised without network access or API quota.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+WEATHER_RESPONSE = {
+    "name": "Samara",
+    "main": {"temp": -3.5, "feels_like": -7.1, "humidity": 81},
+    "weather": [{"description": "пасмурно"}],
+    "wind": {"speed": 4.2},
+}
+
+SUN_RESPONSE = {
+    "results": {
+        "sunrise": "2026-10-18T07:12:00+04:00",
+        "sunset": "2026-10-18T17:48:00+04:00",
+        "day_length": 38160,
+    },
+    "status": "OK",
+}
+
+SUN_RESPONSE_WEEK_PAST = {
+    "results": {
+        "sunrise": "2026-10-11T06:59:00+04:00",
+        "sunset": "2026-10-11T18:05:00+04:00",
+        "day_length": 39960,
+    },
+    "status": "OK",
+}
+
+
+def group_response(ids: str) -> dict:
+    """Answer of the group endpoint for comma separated city IDs, every city named after its ID"""
+    cities = [dict(WEATHER_RESPONSE, id=int(city), name=f"City {city}") for city in ids.split(",")]
+    return {"cnt": len(cities), "list": cities}
+
+
+class FakeApiServer:
+    """Threaded HTTP server answering /weather, /group and /sun like the real APIs"""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.requests = 0
+        self.connections = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeApiServer":
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                super().setup()
+                owner.connections += 1
+
+            def do_GET(self) -> None:
+                owner.requests += 1
+                if owner.delay:
+                    time.sleep(owner.delay)
+
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/weather":
+                    body = WEATHER_RESPONSE
+                elif url.path == "/group":
+                    body = group_response(query["id"][0])
+                elif url.path == "/sun":
+                    body = SUN_RESPONSE_WEEK_PAST if "date" in query else SUN_RESPONSE
+                else:
+                    self.send_error(404)
+                    return
+
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeApiServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,49 @@
+"""Controllable clock for the modes and the refresher."""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+
+import InfoPanel.core.modes as modes
+import InfoPanel.core.refresher as refresher
+
+
+class FakeClock:
+    def __init__(self, start: float) -> None:
+        self._now = start
+
+    def time(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float) -> None:
+        self._now += seconds
+
+    def advance_to(self, deadline: float) -> None:
+        self._now = max(self._now, deadline)
+
+
+def _datetime_for(clock: FakeClock) -> type:
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(clock.time(), tz)
+
+    return FakeDatetime
+
+
+class _TimeModule:
+    def __init__(self, clock: FakeClock) -> None:
+        self.time = clock.time
+
+
+@contextmanager
+def patch_clock(clock: FakeClock) -> Iterator[FakeClock]:
+    """Route time.time() and datetime.now() of the modes and the refresher to the clock"""
+    saved = [(modes, "time", modes.time), (modes, "datetime", modes.datetime), (refresher, "time", refresher.time)]
+    modes.time = _TimeModule(clock)
+    modes.datetime = _datetime_for(clock)
+    refresher.time = _TimeModule(clock)
+    try:
+        yield clock
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
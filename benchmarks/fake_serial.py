@@ -0,0 +1,114 @@
+"""In-memory stand-in for serial.Serial with simulated link timing."""
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Set
+
+import serial
+
+import display_transport
+from display_link import STATUS_REQUEST
+
+BITS_PER_BYTE = 10  # start bit, 8 data bits, stop bit
+
+
+class FakeSerial:
+    """Records every write and the time the bytes would take on the wire.\n
+    With realtime=True the write blocks for that time like a real 9600 baud port,
+    with buffered=True it returns at once like a non-blocking port and the bytes wait
+    in the driver buffer (out_waiting) until they are on the wire (glass_at).
+    Stall adds a fixed delay to every write to imitate a hung adapter.
+    The device answers a status request only when the port runs at device_baudrate.
+    Ports in unplugged fail to open and to write like a dropped USB adapter"""
+    instances: List["FakeSerial"] = []
+    unplugged: Set[str] = set()
+
+    def __init__(self, port: str = None, baudrate: int = 9600, realtime: bool = False, buffered: bool = False,
+                 device_baudrate: int = 9600, timeout: Optional[float] = None, **kwargs) -> None:
+        self.port = port
+        self.baudrate = baudrate
+        self.device_baudrate = device_baudrate
+        self.timeout = timeout
+        self.realtime = realtime
+        self.buffered = buffered
+        self.glass_at = 0.0
+        self._input = bytearray()
+        self.opened_at = time.monotonic()
+        if port in FakeSerial.unplugged:
+            raise serial.SerialException(f"could not open port {port}")
+        self.stall = 0.0
+        self.is_open = True
+        self.writes: List[bytes] = []
+        self.write_times: List[float] = []
+        self.link_time = 0.0
+        FakeSerial.instances.append(self)
+
+    def wire_time(self, size: int) -> float:
+        return size * BITS_PER_BYTE / self.baudrate
+
+    def write(self, data) -> int:
+        if self.port in FakeSerial.unplugged:
+            raise serial.SerialException("write failed: device disconnected")
+        data = bytes(data)
+        now = time.monotonic()
+        self.writes.append(data)
+        self.write_times.append(now)
+        seconds = self.wire_time(len(data))
+        self.link_time += seconds
+        self.glass_at = max(now, self.glass_at) + seconds
+        if STATUS_REQUEST in data and self.baudrate == self.device_baudrate:
+            self._input += b"\x00"
+        if self.realtime and not self.buffered:
+            time.sleep(seconds + self.stall)
+        return len(data)
+
+    @property
+    def out_waiting(self) -> int:
+        """Bytes written but not yet on the wire"""
+        if not self.buffered:
+            return 0
+        return int(max(self.glass_at - time.monotonic(), 0.0) / self.wire_time(1))
+
+    def read(self, size: int = 1) -> bytes:
+        data = bytes(self._input[:size])
+        del self._input[:size]
+        if len(data) < size and self.realtime and self.timeout:
+            time.sleep(self.timeout)
+        return data
+
+    def reset_input_buffer(self) -> None:
+        self._input.clear()
+
+    def flush(self) -> None:
+        pass
+
+    def open(self) -> None:
+        self.is_open = True
+
+    def close(self) -> None:
+        self.is_open = False
+
+    @property
+    def bytes_written(self) -> int:
+        return sum(len(data) for data in self.writes)
+
+    def reset_counters(self) -> None:
+        self.writes.clear()
+        self.write_times.clear()
+        self.link_time = 0.0
+
+
+@contextmanager
+def patch_serial(realtime: bool = False, device_baudrate: int = 9600, buffered: bool = False) -> Iterator[None]:
+    """Make display transports open FakeSerial ports instead of real ones"""
+    original = display_transport.serial.Serial
+
+    def factory(*args, **kwargs):
+        return FakeSerial(*args, realtime=realtime, buffered=buffered, device_baudrate=device_baudrate, **kwargs)
+
+    display_transport.serial.Serial = factory
+    FakeSerial.instances = []
+    FakeSerial.unplugged = set()
+    try:
+        yield
+    finally:
+        display_transport.serial.Serial = original
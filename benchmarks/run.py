@@ -0,0 +1,189 @@
+"""Benchmark of the display stack and every mode against a fake 9600 baud serial port.
+
+Each scenario runs one simulated hour on a controllable clock, the way InfoPanel.start
+drives a mode: update() inside a frame, then jump to the mode's next deadline.
+Services are replaced with canned refresher snapshots.
+
+Run from the repository root:
+    python -m benchmarks.run               compare with benchmarks/baseline.json
+    python -m benchmarks.run --save        store the results as the new baseline
+"""
+import argparse
+import json
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from display_helper import Display, DisplayWithBuffer
+from InfoPanel.core.modes import AutoSwitchMode, ClockMode, Mode, SunMode, WeatherMode
+from InfoPanel.core.refresher import BackgroundRefresher, Snapshot
+from benchmarks.fake_clock import FakeClock, patch_clock
+from benchmarks.fake_serial import FakeSerial, patch_serial
+
+BASELINE = Path(__file__).with_name("baseline.json")
+START = datetime(2026, 10, 18, 7, 59, 30).timestamp()
+DURATION = 60 * 60
+
+WEATHER = {
+    "city": "Samara",
+    "temperature": -3.5,
+    "feels_like": -7.1,
+    "humidity": 81,
+    "description": "пасмурно",
+    "wind_speed": 4.2,
+}
+
+WEATHER_LONG = dict(WEATHER, city="Санкт-Петербург", description="небольшой снег с дождём")
+
+SUN = {
+    "sunrise": "2026-10-18T07:12:00+04:00",
+    "sunset": "2026-10-18T17:48:00+04:00",
+    "day_length": 38160,
+    "day_length_past": 39960,
+}
+
+
+@dataclass
+class Result:
+    wakeups: int
+    frames: int
+    bytes_per_frame: float
+    max_fps: float
+    latency_ms: float
+    cpu_us_per_apply: float
+
+
+def _stub(name: str, value: dict, clock: FakeClock) -> BackgroundRefresher:
+    return BackgroundRefresher(name, lambda: value, ttl=DURATION, initial=Snapshot(value, clock.time()))
+
+
+def _build_modes(display: Display, clock: FakeClock) -> Dict[str, Mode]:
+    weather = _stub("weather", WEATHER, clock)
+    weather_long = _stub("weather_long", WEATHER_LONG, clock)
+    sun = _stub("sun", SUN, clock)
+    clock_mode = ClockMode(display)
+    weather_mode = WeatherMode(display, weather)
+    sun_mode = SunMode(display, sun)
+    auto = AutoSwitchMode(display, {"clock": ClockMode(display), "weather": WeatherMode(display, weather),
+                                    "sun": SunMode(display, sun)})
+    return {"clock": clock_mode, "weather": weather_mode, "weather_scroll": WeatherMode(display, weather_long),
+            "sun": sun_mode, "auto_switch": auto}
+
+
+def _measure(port: FakeSerial, clock: FakeClock, step: Callable[[], Optional[float]]) -> Result:
+    """Call step until the simulated hour is over. step draws one frame and returns the next deadline"""
+    end = clock.time() + DURATION
+    port.reset_counters()
+    wakeups = 0
+    frames = 0
+    cpu = 0.0
+    latency = 0.0
+
+    while clock.time() < end:
+        sent_before = len(port.writes)
+        started = time.perf_counter()
+        deadline = step()
+        elapsed = time.perf_counter() - started
+
+        wakeups += 1
+        cpu += elapsed
+        new_writes = port.writes[sent_before:]
+        if new_writes:
+            frames += 1
+            latency += elapsed + port.wire_time(sum(len(data) for data in new_writes))
+        clock.advance_to(deadline if deadline is not None else clock.time() + 60)
+
+    bytes_per_frame = port.bytes_written / frames if frames else 0.0
+    return Result(
+        wakeups=wakeups,
+        frames=frames,
+        bytes_per_frame=round(bytes_per_frame, 2),
+        max_fps=round(1 / port.wire_time(bytes_per_frame), 1) if bytes_per_frame else 0.0,
+        latency_ms=round(latency / frames * 1000, 3) if frames else 0.0,
+        cpu_us_per_apply=round(cpu / wakeups * 1e6, 1),
+    )
+
+
+def _redraw_scenario(display_class: type, clock: FakeClock) -> Result:
+    display = display_class("BENCH")
+    port = FakeSerial.instances[-1]
+
+    def step() -> float:
+        now = datetime.fromtimestamp(clock.time())
+        lines = (now.strftime("%d.%m.%Y"), now.strftime("%H:%M"))
+        if isinstance(display, DisplayWithBuffer):
+            display.render_frame(lines)
+        else:
+            with display.frame():
+                display.clear()
+                for line in lines:
+                    display.print_line_endl(line)
+        return (clock.time() // 60 + 1) * 60
+
+    return _measure(port, clock, step)
+
+
+def _mode_scenario(display_class: type, name: str, clock: FakeClock) -> Result:
+    display = display_class("BENCH")
+    port = FakeSerial.instances[-1]
+    mode = _build_modes(display, clock)[name]
+    previous: Mode = mode if name == "clock" else ClockMode(display)
+
+    def step() -> float:
+        nonlocal previous
+        with display.frame():
+            frame = mode.update(previous)
+            if frame is not None:
+                display.show(frame)
+        previous = mode
+        return mode.deadline(clock.time())
+
+    return _measure(port, clock, step)
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    results = {}
+    with patch_serial():
+        for display_class in (Display, DisplayWithBuffer):
+            label = display_class.__name__
+            with patch_clock(FakeClock(START)) as clock:
+                results[f"{label}/redraw"] = asdict(_redraw_scenario(display_class, clock))
+            for name in ("clock", "weather", "weather_scroll", "sun", "auto_switch"):
+                with patch_clock(FakeClock(START)) as clock:
+                    results[f"{label}/{name}"] = asdict(_mode_scenario(display_class, name, clock))
+    return results
+
+
+def _print(results: Dict[str, Dict[str, float]], baseline: Optional[Dict[str, Dict[str, float]]]) -> None:
+    columns = list(next(iter(results.values())).keys())
+    print(f"{'scenario':<30}" + "".join(f"{column:>18}" for column in columns))
+    for scenario, values in results.items():
+        row = f"{scenario:<30}"
+        for column in columns:
+            cell = f"{values[column]:g}"
+            old = (baseline or {}).get(scenario, {}).get(column)
+            if old not in (None, 0) and old != values[column]:
+                cell += f" ({(values[column] - old) / old:+.0%})"
+            row += f"{cell:>18}"
+        print(row)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    args = parser.parse_args()
+
+    results = run()
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else None
+    _print(results, None if args.save else baseline)
+
+    if args.save:
+        args.baseline.write_text(json.dumps(results, indent=4), encoding="utf-8")
+        print(f"baseline saved to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
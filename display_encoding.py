@@ -0,0 +1,110 @@
+from functools import lru_cache
+from typing import Dict, Mapping, Optional, Union
+
+CODE_PAGES = {
+    "RU": "cp866",
+    "JP": "shift_jis",
+    "EU": "ascii",
+}
+
+DEFAULT_FALLBACK: Dict[str, Union[str, bytes]] = {
+    "ё": "е",
+    "Ё": "Е",
+    "«": '"',
+    "»": '"',
+    "“": '"',
+    "”": '"',
+    "„": '"',
+    "‘": "'",
+    "’": "'",
+    "—": "-",
+    "–": "-",
+    "…": "...",
+    "№": "N",
+    "\u00a0": " ",
+}
+
+DEGREE_GLYPH: Dict[str, bytes] = {
+    "EU": b"\xF8",  # code table 0 of the display is PC437
+    "JP": b"\xDF",  # half-width handakuten in the katakana table
+}
+
+
+class _SingleByteTable(dict):
+    """Translate table for the single byte characters of a code page. Unknown characters are mapped
+    to the replacement once and remembered"""
+    def __init__(self, table : Dict[int, str], replacement : str):
+        super().__init__(table)
+        self.__replacement = replacement
+
+    def __missing__(self, key : int) -> str:
+        self[key] = self.__replacement
+        return self.__replacement
+
+
+class CharsetEncoder:
+    """Encoder for one code page of the display, compiled into a translate table once.\n
+    Characters the code page can not show are taken from the fallback map,
+    the rest become the replacement character, so encode() never raises.
+    The display shows single byte characters only: every character is one byte and one cell,
+    the double byte characters of shift_jis are replaced as well.
+    A fallback can be a text (any length) or bytes (the code of one cell, e.g. a glyph)"""
+    def __init__(self, code : str, fallback : Optional[Mapping[str, Union[str, bytes]]] = None, replacement : str = "?"):
+        if code not in CODE_PAGES:
+            raise ValueError(f"Invalid code: '{code}'. Supported: {', '.join(CODE_PAGES)}")
+
+        self.__code = code
+        self.__codec = CODE_PAGES[code]
+
+        if fallback is None:
+            fallback = dict(DEFAULT_FALLBACK)
+            if code in DEGREE_GLYPH:
+                fallback["°"] = DEGREE_GLYPH[code]
+
+        self.__table = self.__compile(fallback, replacement)
+        # characters whose fallback takes other than one cell, expanded to the fallback text
+        self.__expand = {ord(char): value for char, value in fallback.items()
+                         if isinstance(value, str) and len(value) != 1 and len(self.__table[ord(char)]) != 1}
+
+    @property
+    def code(self) -> str:
+        return self.__code
+
+    def encode(self, text : str) -> bytes:
+        """Encode a text in one pass"""
+        return text.translate(self.__table).encode('latin-1')
+
+    def expand(self, text : str) -> str:
+        """The text with the fallbacks longer or shorter than one character put in,
+        so len() is the number of cells encode() takes and encode() gives the same bytes"""
+        return text.translate(self.__expand) if self.__expand else text
+
+    def __compile(self, fallback : Mapping[str, Union[str, bytes]], replacement : str) -> Dict[int, str]:
+        """Map every single byte character of the code page to its byte, carried as a latin-1 character.
+        Lead bytes of double byte characters do not decode alone and are left out"""
+        table = {}
+        for byte in range(256):
+            try:
+                char = bytes([byte]).decode(self.__codec)
+            except UnicodeDecodeError:
+                continue
+            table[ord(char)] = chr(byte)
+
+        replacement = table.get(ord(replacement), "?")
+        for char, value in fallback.items():
+            if ord(char) in table:
+                continue
+            if isinstance(value, bytes):
+                if len(value) != 1:
+                    raise ValueError(f"Fallback of '{char}' must be one byte, got {len(value)}")
+                table[ord(char)] = value.decode('latin-1')
+            else:
+                table[ord(char)] = "".join(table.get(ord(c), replacement) for c in value)
+
+        return _SingleByteTable(table, replacement)
+
+
+@lru_cache(maxsize=None)
+def encoder_for(code : str) -> CharsetEncoder:
+    """Return the shared encoder with the default fallback map for a code page"""
+    return CharsetEncoder(code)
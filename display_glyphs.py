@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 7
+
+# codes given to user-defined characters: rarely shown ASCII, the same byte in every code page.
+# While the user-defined set is selected these codes show the resident glyphs instead
+DEFAULT_SLOTS = b"`{|}~^_\\"
+
+
+@dataclass(frozen=True)
+class Glyph:
+    """Bitmap of a user-defined character: one byte per column of the 5x7 cell, the top dot is the high bit"""
+    name: str
+    columns: bytes
+
+    def __post_init__(self):
+        if len(self.columns) != GLYPH_WIDTH:
+            raise ValueError(f"Glyph '{self.name}' must have {GLYPH_WIDTH} columns")
+
+    @classmethod
+    def from_rows(cls, name : str, rows : Sequence[str]) -> "Glyph":
+        """Build a glyph from 7 rows of 5 characters, '#' is a lit dot"""
+        if len(rows) != GLYPH_HEIGHT or any(len(row) != GLYPH_WIDTH for row in rows):
+            raise ValueError(f"Glyph '{name}' must be {GLYPH_WIDTH}x{GLYPH_HEIGHT}")
+
+        columns = bytearray(GLYPH_WIDTH)
+        for y, row in enumerate(rows):
+            for x, dot in enumerate(row):
+                if dot == "#":
+                    columns[x] |= 0x80 >> y
+        return cls(name, bytes(columns))
+
+    def command(self, code : int) -> bytes:
+        """ESC & command that downloads the glyph to the code"""
+        return bytes([0x1B, 0x26, 0x01, code, code, GLYPH_WIDTH]) + self.columns
+
+
+GLYPHS: Dict[str, Glyph] = {glyph.name: glyph for glyph in (
+    Glyph.from_rows("degree", [".##..", "#..#.", "#..#.", ".##..", ".....", ".....", "....."]),
+    Glyph.from_rows("arrow_up", ["..#..", ".###.", "#.#.#", "..#..", "..#..", "..#..", "..#.."]),
+    Glyph.from_rows("arrow_down", ["..#..", "..#..", "..#..", "..#..", "#.#.#", ".###.", "..#.."]),
+    Glyph.from_rows("sun", ["..#..", "#...#", ".###.", "#####", ".###.", "#...#", "..#.."]),
+    Glyph.from_rows("cloud", [".....", ".##..", "#..##", "#...#", "#####", ".....", "....."]),
+    Glyph.from_rows("drop", ["..#..", "..#..", ".###.", ".###.", "#####", "#####", ".###."]),
+)}
+
+for _level in range(1, GLYPH_HEIGHT + 1):
+    GLYPHS[f"bar{_level}"] = Glyph.from_rows(
+        f"bar{_level}", ["....." if y < GLYPH_HEIGHT - _level else "#####" for y in range(GLYPH_HEIGHT)])
+
+
+@dataclass(frozen=True)
+class GlyphStats:
+    hits: int
+    misses: int
+    evictions: int
+    resident: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class GlyphCache:
+    """Tracks which glyphs are resident in the limited user-defined character slots of the device.\n
+    A glyph is downloaded only on a miss, when every slot is taken the least recently used glyph is replaced"""
+    def __init__(self, slots : bytes = DEFAULT_SLOTS):
+        if not slots:
+            raise ValueError("At least one slot is required")
+        self.__slots = bytes(slots)
+        self.__resident: "OrderedDict[Glyph, int]" = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    @property
+    def slots(self) -> bytes:
+        return self.__slots
+
+    def lookup(self, glyph : Glyph) -> Optional[int]:
+        """Code of a resident glyph, marked as recently used. None on a miss"""
+        code = self.__resident.get(glyph)
+        if code is None:
+            self.__misses += 1
+            return None
+        self.__resident.move_to_end(glyph)
+        self.__hits += 1
+        return code
+
+    def allocate(self, glyph : Glyph) -> int:
+        """Take a free slot for the glyph, or the slot of the least recently used one"""
+        if len(self.__resident) < len(self.__slots):
+            code = self.__slots[len(self.__resident)]
+        else:
+            _, code = self.__resident.popitem(last=False)
+            self.__evictions += 1
+        self.__resident[glyph] = code
+        return code
+
+    def resident(self) -> list[tuple[Glyph, int]]:
+        """Resident glyphs and their codes, the least recently used first"""
+        return list(self.__resident.items())
+
+    def invalidate(self):
+        """Forget every resident glyph, the device lost them on reset"""
+        self.__resident.clear()
+
+    def stats(self) -> GlyphStats:
+        return GlyphStats(self.__hits, self.__misses, self.__evictions, len(self.__resident))
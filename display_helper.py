@@ -1,12 +1,346 @@
-import serial
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Deque, Iterator, Mapping, Optional, Sequence, Union
+
+from display_encoding import CharsetEncoder, encoder_for
+from display_glyphs import DEFAULT_SLOTS, GLYPHS, Glyph, GlyphCache, GlyphStats
+from display_link import SUPPORTED_BAUDRATES, negotiate
+from display_transport import SerialTransport, Transport, TransportStats, open_transport
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RenderResult:
+    """Bytes sent for one frame compared with a full clear-and-redraw"""
+    bytes_sent: int
+    bytes_full: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_full - self.bytes_sent
+
+
+@dataclass(frozen=True)
+class Frame:
+    """Pre-rendered screen: the text of every row, its encoded device bytes padded to the row width,
+    and the ready-to-send bytes that clear the display and draw the whole frame"""
+    lines: tuple
+    rows: tuple
+    payload: bytes
+    cursor: tuple
+
+    @property
+    def screen(self) -> bytes:
+        """All rows as one byte string, the layout of FrameBuffer"""
+        return b"".join(self.rows)
+
+
+class FrameCache:
+    """Bounded LRU cache of pre-rendered frames keyed by their content"""
+    def __init__(self, maxsize : int = 64):
+        self.__frames: "OrderedDict[tuple, Frame]" = OrderedDict()
+        self.__maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key : tuple) -> Optional[Frame]:
+        frame = self.__frames.get(key)
+        if frame is None:
+            self.misses += 1
+            return None
+        self.__frames.move_to_end(key)
+        self.hits += 1
+        return frame
+
+    def put(self, key : tuple, frame : Frame):
+        self.__frames[key] = frame
+        self.__frames.move_to_end(key)
+        if len(self.__frames) > self.__maxsize:
+            self.__frames.popitem(last=False)
+
+    def clear(self):
+        self.__frames.clear()
+
+    def __len__(self) -> int:
+        return len(self.__frames)
+
+
+@dataclass(frozen=True)
+class WriterStats:
+    """State of the background writer"""
+    queue_depth: int
+    written: int
+    dropped: int
+    merged: int
+    errors: int
+    last_latency: float
+    max_latency: float
+    avg_latency: float
+    cancelled: int = 0
+
+
+@dataclass(frozen=True)
+class LinkStats:
+    connected: bool
+    reconnects: int
+    downtime: float
+    last_error: Optional[str]
+
+
+@dataclass
+class _PendingFrame:
+    data: bytes
+    keyframe: bool
+    sticky: bool
+    cancellable: bool = False
+
+
+class FrameWriter:
+    """Background thread writing frames to the port.\n
+    A keyframe (a frame starting with clear or reset) supersedes everything queued before it,
+    so when the port falls behind the old frames are dropped and only the newest is written.
+    Frames that change the device state (code page) are never dropped.
+    When the queue is full the queued frames are replaced with redraw(), one keyframe drawing
+    the screen the new frame leaves; a writer without redraw() appends the new frame to the last queued one.\n
+    A cancellable frame is written in chunks of CHUNK bytes, split where cut() allows;
+    a keyframe submitted meanwhile cancels the rest of it.\n
+    wake() runs idle() on the writer thread, e.g. to reopen a lost port between frames."""
+    CHUNK = 8
+
+    def __init__(self, write : Callable[[bytes], object], max_depth : int = 4,
+                 cut : Optional[Callable[[memoryview, int], int]] = None,
+                 idle : Optional[Callable[[], object]] = None,
+                 redraw : Optional[Callable[[], Optional[bytes]]] = None):
+        if max_depth < 1:
+            raise ValueError("max_depth must be at least 1")
+
+        self.__write = write
+        self.__max_depth = max_depth
+        self.__cut = cut
+        self.__idle = idle
+        self.__redraw = redraw
+        self.__pending: Deque[_PendingFrame] = deque()
+        self.__condition = threading.Condition()
+        self.__thread: Optional[threading.Thread] = None
+        self.__running = False
+        self.__busy = False
+        self.__preempted = False
+        self.__woken = False
+
+        self.__written = 0
+        self.__dropped = 0
+        self.__merged = 0
+        self.__cancelled = 0
+        self.__errors = 0
+        self.__last_latency = 0.0
+        self.__max_latency = 0.0
+        self.__total_latency = 0.0
+
+    def start(self):
+        """Start the writer thread"""
+        with self.__condition:
+            if self.__running:
+                return
+            self.__running = True
+        self.__thread = threading.Thread(target=self.__run, name="display-writer", daemon=True)
+        self.__thread.start()
+
+    def stop(self, timeout : float = 1.0):
+        """Write what is queued and stop the writer thread"""
+        self.flush(timeout)
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+            self.__thread = None
+
+    def submit(self, data : bytes, keyframe : bool = False, sticky : bool = False, cancellable : bool = False):
+        """Queue a frame and return immediately"""
+        with self.__condition:
+            if not keyframe and not sticky and len(self.__pending) >= self.__max_depth and self.__redraw is not None:
+                redraw = self.__redraw()
+                if redraw is not None:
+                    data, keyframe = redraw, True
+
+            if keyframe:
+                kept = [frame for frame in self.__pending if frame.sticky]
+                self.__dropped += len(self.__pending) - len(kept)
+                self.__pending = deque(kept)
+                self.__preempted = self.__busy
+
+            if len(self.__pending) >= self.__max_depth:
+                last = self.__pending[-1]
+                last.data += data
+                last.sticky = last.sticky or sticky
+                last.cancellable = last.cancellable and cancellable
+                self.__merged += 1
+            else:
+                self.__pending.append(_PendingFrame(data, keyframe, sticky, cancellable and not sticky))
+            self.__condition.notify_all()
+
+    def wake(self):
+        """Run idle() on the writer thread once it has nothing to write"""
+        with self.__condition:
+            self.__woken = True
+            self.__condition.notify_all()
+
+    @property
+    def backlog(self) -> bool:
+        """A frame is being written or queued"""
+        with self.__condition:
+            return self.__busy or bool(self.__pending)
+
+    def flush(self, timeout : Optional[float] = None) -> bool:
+        """Wait until every queued frame is written. Return False on timeout"""
+        with self.__condition:
+            return self.__condition.wait_for(lambda: not self.__pending and not self.__busy, timeout)
+
+    def stats(self) -> WriterStats:
+        """Return queue depth, drop counts and write latency"""
+        with self.__condition:
+            return WriterStats(
+                queue_depth=len(self.__pending),
+                written=self.__written,
+                dropped=self.__dropped,
+                merged=self.__merged,
+                errors=self.__errors,
+                last_latency=self.__last_latency,
+                max_latency=self.__max_latency,
+                avg_latency=self.__total_latency / self.__written if self.__written else 0.0,
+                cancelled=self.__cancelled,
+            )
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__pending or self.__woken or not self.__running)
+                if not self.__pending:
+                    if not self.__running:
+                        return
+                    self.__woken = False
+                    frame = None
+                else:
+                    frame = self.__pending.popleft()
+                    self.__busy = True
+                    self.__preempted = False
+
+            if frame is None:
+                if self.__idle is not None:
+                    self.__idle()
+                continue
+
+            started = time.perf_counter()
+            try:
+                if frame.cancellable and self.__cut is not None:
+                    self.__write_chunks(frame.data)
+                else:
+                    self.__write(frame.data)
+                failed = False
+            except Exception:
+                failed = True
+            latency = time.perf_counter() - started
+
+            with self.__condition:
+                self.__busy = False
+                if failed:
+                    self.__errors += 1
+                else:
+                    self.__written += 1
+                    self.__last_latency = latency
+                    self.__max_latency = max(self.__max_latency, latency)
+                    self.__total_latency += latency
+                self.__condition.notify_all()
+
+    def __write_chunks(self, data : bytes):
+        """Write a frame piece by piece and give up the rest once a newer keyframe is queued.
+        The keyframe clears the screen, so the cells the rest would have drawn do not matter"""
+        view = memoryview(data)
+        start = 0
+        while start < len(view):
+            end = self.__cut(view, start + self.CHUNK) if start + self.CHUNK < len(view) else len(view)
+            self.__write(view[start:end])
+            start = end
+            if start < len(view):
+                with self.__condition:
+                    if self.__preempted:
+                        self.__cancelled += 1
+                        return
+
 
 class Display:
     """Class for working with serial display"""
-    def __init__(self, display_name : str, baudrate : int =9600, code : str = "RU", max_row_size : int = 1, max_col_size : int = 20):
-        self.__display = serial.Serial(port= display_name, baudrate=baudrate)
-        self.__display_name = display_name
+    _CLEAR_SIZE = 1
+    _CURSOR_MOVE_SIZE = 4
+    _CODE_COMMANDS = {
+        "RU": b'\x1B\x74\x11',
+        "JP": b'\x1B\x74\x01\x1B\x52\x08',
+        "EU": b'\x1B\x74\x00',
+    }
+    RECONNECT_DELAY = 0.05
+    RECONNECT_MAX_DELAY = 0.5  # opening a missing port fails at once, retrying often costs nothing
+    OUTPUT_AHEAD = 0.01  # seconds of wire time a serial driver gets ahead with the writer running
+    WRITE_TIMEOUT = 1.0  # seconds a write may stall beyond its wire time before the link counts as lost
+
+    def __init__(self, display_name : Union[str, Transport], baudrate : int =9600, code : str = "RU", max_row_size : int = 1, max_col_size : int = 20,
+                 frame_capacity : int = 128, fallback : Optional[Mapping[str, Union[str, bytes]]] = None,
+                 metrics = None, glyph_slots : bytes = DEFAULT_SLOTS):
+        """
+        :param display_name: serial port name, transport address (see display_transport.open_transport) or a Transport
+        :param fallback: replacement for characters missing in the code page, the default map if omitted
+        :param metrics: registry with counter(name)/histogram(name, buckets) for bytes, writes and write latency,
+            named display.<port>.<metric> so every port can be told apart
+        :param glyph_slots: character codes given to user-defined glyphs
+        """
+        self.__display = display_name if isinstance(display_name, Transport) else open_transport(display_name, baudrate)
+        self.__display.open()
+        self.__display_name = self.__display.name
         self.__baudrate = baudrate
         self.__code = code
+        self.__fallback = fallback
+        self.__encoder: Optional[CharsetEncoder] = None
+        self.frames = FrameCache()
+        self.glyphs = GlyphCache(glyph_slots)
+        self.__glyphs_selected = False
+
+        self.__frame = bytearray(frame_capacity)
+        self.__frame_size = 0
+        self.__frame_depth = 0
+        self.__frame_keyframe = False
+        self.__frame_sticky = False
+        self.__writer: Optional[FrameWriter] = None
+        self.__shown: Optional[Frame] = None
+
+        self.__link_lock = threading.RLock()
+        self.__closed = False
+        self.__down_since: Optional[float] = None
+        self.__next_attempt = 0.0
+        self.__backoff = self.RECONNECT_DELAY
+        self.__reconnects = 0
+        self.__downtime = 0.0
+        self.__last_error: Optional[str] = None
+
+        self.__metrics = None
+        self.__glyph_metrics = None
+        self.__link_metrics = None
+        if metrics is not None:
+            prefix = f"display.{self.__display_name}"
+            self.__metrics = (
+                metrics.counter(f"{prefix}.writes"),
+                metrics.counter(f"{prefix}.bytes"),
+                metrics.histogram(f"{prefix}.frame_bytes", (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)),
+                metrics.histogram(f"{prefix}.write_seconds"),
+            )
+            self.__glyph_metrics = (metrics.counter(f"{prefix}.glyph_hits"), metrics.counter(f"{prefix}.glyph_misses"))
+            self.__link_metrics = (
+                metrics.counter(f"{prefix}.reconnects"),
+                metrics.histogram(f"{prefix}.downtime_seconds", (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)),
+            )
 
         self._max_row_size = max_row_size
         self._max_column_size = max_col_size
@@ -14,25 +348,284 @@ class Display:
         self._row = 0
         self._column = 0
 
-        self._reset()
-        self.set_code(self.__code)
+        with self.frame():
+            self._reset()
+            self.set_code(self.__code)
 
     def close(self):
         """Close the serial display after work"""
+        if self.__writer is not None:
+            self.__writer.stop()
+            self.__writer = None
+        self.__closed = True  # a writer still stuck on a stalled port must not take the close for a lost link
         self.__display.close()
 
+    def start_writer(self, max_depth : int = 4):
+        """Hand every frame to a background writer thread instead of writing it on the caller thread.\n
+        A serial driver is then given at most OUTPUT_AHEAD seconds of data ahead of the wire,
+        so the frames waiting to be written stay in the writer, where a new frame supersedes them"""
+        if isinstance(self.__display, SerialTransport):
+            self.__display.output_ahead = self.OUTPUT_AHEAD
+        if self.__writer is None:
+            self.__writer = FrameWriter(self.__write_port, max_depth, self._safe_cut, self.__retry_link,
+                                        self._redraw_commands)
+            self.__writer.start()
+
+    @property
+    def baudrate(self) -> int:
+        return self.__baudrate
+
+    def negotiate_baudrate(self, rates : Sequence[int] = SUPPORTED_BAUDRATES,
+                           switch : Optional[Callable[[int], bytes]] = None) -> Optional[int]:
+        """Move the link to the fastest rate the device answers at, see display_link.negotiate.
+        The display is reset again on the new rate. Must be called before start_writer()\n
+        Returns the verified rate, None if no rate was verified and the link stays as it was"""
+        if self.__writer is not None:
+            raise RuntimeError("Negotiate the link before starting the writer")
+
+        if not isinstance(self.__display, SerialTransport):
+            return None
+
+        rate = negotiate(self.__display.port, rates, switch)
+        if rate is not None:
+            self.__baudrate = rate
+            self.__display.baudrate = rate
+            with self.frame():
+                self._reset()
+                self.set_code(self.__code)
+        return rate
+
+    @property
+    def transport(self) -> Transport:
+        return self.__display
+
+    def transport_stats(self) -> TransportStats:
+        """Return the bytes taken by the link and its throughput"""
+        return self.__display.stats()
+
+    def writer_stats(self) -> Optional[WriterStats]:
+        """Return the background writer stats, None if there is no writer"""
+        return self.__writer.stats() if self.__writer is not None else None
+
+    @property
+    def backlog(self) -> bool:
+        """The background writer is still writing or has frames queued"""
+        return self.__writer is not None and self.__writer.backlog
+
     def __send_byte(self, byte : bytes):
-        """Send a byte to the display"""
-        self.__display.write(bytearray(byte))
-
-    def __write_text(self, text : str):
-        """Write a text to the display with the selected encoding"""
-        if self.__code == "RU":
-            self.__send_byte(text.encode('cp866'))
-        elif self.__code == "JP":
-            self.__send_byte(text.encode('shift_jis'))
-        elif self.__code == "EU":
-            self.__send_byte(text.encode('ascii'))
+        """Send a byte to the display, or add it to the open frame"""
+        if not self.__frame_depth:
+            self.__flush(byte)
+            return
+
+        end = self.__frame_size + len(byte)
+        if end > len(self.__frame):
+            self.__frame.extend(bytes(max(end, 2 * len(self.__frame)) - len(self.__frame)))
+        self.__frame[self.__frame_size:end] = byte
+        self.__frame_size = end
+
+    def begin_frame(self):
+        """Start collecting all commands into one write. Frames can be nested, only the outer commit writes"""
+        self.__frame_depth += 1
+
+    def commit(self):
+        """Close the frame and send everything collected in it with a single write"""
+        if not self.__frame_depth:
+            raise RuntimeError("No frame to commit")
+
+        self.__frame_depth -= 1
+        if self.__frame_depth or not self.__frame_size:
+            return
+
+        size = self.__frame_size
+        self.__frame_size = 0
+        with memoryview(self.__frame) as view:
+            self.__flush(view[:size])
+
+    def __flush(self, data):
+        """Write the data to the port, or queue it for the writer thread"""
+        keyframe, sticky = self.__frame_keyframe, self.__frame_sticky
+        self.__frame_keyframe = False
+        self.__frame_sticky = False
+
+        if self.__metrics is not None:
+            writes, sent, frame_bytes, _ = self.__metrics
+            writes.inc()
+            sent.inc(len(data))
+            frame_bytes.observe(len(data))
+
+        if self.__writer is None:
+            self.__write_port(data)
+        else:
+            self.__writer.submit(bytes(data), keyframe, sticky, cancellable=True)
+
+    def __write_port(self, data):
+        """Write the data to the serial port.\n
+        While the port is lost the data is dropped, the resync after the reconnect redraws the whole screen.
+        The link lock is never held during the write, a stalled port does not block check_link(),
+        and a write stalled for WRITE_TIMEOUT is handled like a lost port"""
+        if self.__closed:
+            return
+        if self.__down_since is not None:
+            self.__retry_link()
+            return
+
+        started = time.perf_counter()
+        try:
+            self.__display.write(data, self.WRITE_TIMEOUT + len(data) * 10 / self.__baudrate)
+        except OSError as e:
+            if self.__closed:
+                return  # the transport was closed under a stalled write
+            with self.__link_lock:
+                self.__disconnected(e)
+            return
+        if self.__metrics is not None:
+            self.__metrics[3].observe(time.perf_counter() - started)
+
+    def __disconnected(self, error : Exception):
+        now = time.monotonic()
+        if self.__down_since is None:
+            logger.warning("Display %s disconnected: %s", self.__display_name, error)
+            self.__down_since = now
+            self.__backoff = self.RECONNECT_DELAY
+        self.__next_attempt = now + self.__backoff
+        self.__last_error = str(error)
+        try:
+            self.__display.close()
+        except OSError:
+            pass
+
+    def __retry_link(self):
+        """Reopen a lost port when the backoff allows and bring the device back to the shadow state.
+        Runs on the writer thread when there is one, so the port is only written by that thread"""
+        with self.__link_lock:
+            resync = self.__reconnect() if self.__down_since is not None else None
+        if resync is None:
+            return
+        if self.__writer is not None:
+            # supersedes the queued frames, the shadow state already contains them
+            self.__writer.submit(resync, keyframe=True, sticky=True)
+        else:
+            self.__write_port(resync)
+
+    def __reconnect(self) -> Optional[bytes]:
+        """Reopen the port when the backoff allows. Returns the resync commands once it is open again"""
+        now = time.monotonic()
+        if now < self.__next_attempt:
+            return None
+
+        try:
+            self.__display.open()
+        except OSError as e:
+            self.__backoff = min(self.__backoff * 2, self.RECONNECT_MAX_DELAY)
+            self.__next_attempt = now + self.__backoff
+            self.__last_error = str(e)
+            return None
+
+        downtime = now - self.__down_since
+        self.__down_since = None
+        self.__reconnects += 1
+        self.__downtime += downtime
+        if self.__link_metrics is not None:
+            self.__link_metrics[0].inc()
+            self.__link_metrics[1].observe(downtime)
+        logger.info("Display %s reconnected after %.2fs", self.__display_name, downtime)
+        return self._resync_commands()
+
+    def check_link(self) -> Optional[float]:
+        """Try to reopen a lost port when the backoff allows. With a writer the attempt is made
+        on the writer thread, so this never waits for a write in progress.\n
+        Returns the time.monotonic() of the next attempt, None while the port is connected"""
+        if self.__down_since is None:
+            return None
+        if self.__writer is None:
+            self.__retry_link()
+        elif time.monotonic() >= self.__next_attempt:
+            self.__writer.wake()
+        return self.__next_attempt if self.__down_since is not None else None
+
+    def link_stats(self) -> LinkStats:
+        """Return the reconnect count and the total time the port was lost, the current outage included"""
+        with self.__link_lock:
+            downtime = self.__downtime
+            if self.__down_since is not None:
+                downtime += time.monotonic() - self.__down_since
+            return LinkStats(self.__down_since is None, self.__reconnects, downtime, self.__last_error)
+
+    def _resync_commands(self) -> bytes:
+        """Commands that bring a reconnected device back: reset, code page, resident glyphs and the screen"""
+        commands = bytearray(b'\x1B\x40' + self._CODE_COMMANDS[self.__code])
+        resident = self.glyphs.resident()
+        for glyph, code in resident:
+            commands += glyph.command(code)
+        if resident:
+            commands += b'\x1B\x25\x01'
+        commands += self._screen_commands()
+        return bytes(commands)
+
+    def _screen_commands(self) -> bytes:
+        """Redraw of the last shown frame, the cursor is left where it is now"""
+        if self.__shown is None:
+            return b""
+        commands, cursor = self._draw_commands(self.__shown.rows)
+        if cursor != (self._row, self._column):
+            commands += self._cursor_command(self._row, self._column)
+        return bytes(commands)
+
+    def _redraw_commands(self) -> Optional[bytes]:
+        """Clear and redraw of the whole screen as the device has it after the last command,
+        None when the display does not keep what was printed (only the last shown frame)"""
+        return None
+
+    @staticmethod
+    def _safe_cut(data : memoryview, position : int) -> int:
+        """First position from the given one that does not split a cursor move (US $ col row).
+        Other bytes of a drawing frame are one-byte commands and one-byte characters"""
+        position = min(position, len(data))
+        for back in (1, 2, 3):
+            start = position - back
+            if start >= 0 and data[start] == 0x1F and start + 4 > position:
+                return min(start + 4, len(data))
+        return position
+
+    @classmethod
+    def _draw_commands(cls, rows : Sequence[bytes]) -> tuple[bytearray, tuple]:
+        """Commands drawing the encoded rows on a clear screen and the cursor position after them"""
+        commands = bytearray()
+        cursor = (0, 0)
+        for row, line in enumerate(rows):
+            text = bytes(line).rstrip(b" ")
+            if text:
+                if cursor != (row, 0):
+                    commands += cls._cursor_command(row, 0)
+                commands += text
+                cursor = (row, len(text))
+        return commands, cursor
+
+    def __mark(self, keyframe : bool = False, sticky : bool = False):
+        """Remember how the next command affects the frames queued in the writer"""
+        if keyframe and not self.__frame_size:
+            self.__frame_keyframe = True
+        if sticky:
+            self.__frame_sticky = True
+
+    @contextmanager
+    def frame(self) -> Iterator["Display"]:
+        """Context manager for begin_frame()/commit()"""
+        self.begin_frame()
+        try:
+            yield self
+        finally:
+            self.commit()
+
+    def _encode(self, text : str) -> bytes:
+        """Encode a text with the selected encoding"""
+        return self.__encoder.encode(text)
+
+    def expand(self, text : str) -> str:
+        """The text as the display shows it, one character per cell: len() is the width it takes
+        after fallbacks such as '…' -> '...' are put in"""
+        return self.__encoder.expand(text)
 
     def set_code(self, code : str):
         """Set the code of the display:\n
@@ -40,31 +633,69 @@ class Display:
         JP - JAPANESE Katakana encoding\n
         EU - ENGLISH default ASCII encoding\n
 
+        Characters missing in the code page are replaced with the fallback map
+
         other throw ValueError"""
-        if code == "RU":
-            self.__code = "RU"
-            self.__send_byte(b'\x1B\x74\x11')
-        elif code == "JP":
-            self.__code = "JP"
-            self.__send_byte(b'\x1B\x74\x01')
-            self.__send_byte(b'\x1B\x52\x08')
-        elif code == "EU":
-            self.__code = "EU"
-            self.__send_byte(b'\x1B\x74\x00')
+        if code in ("RU", "JP", "EU"):
+            self.__encoder = encoder_for(code) if self.__fallback is None else CharsetEncoder(code, self.__fallback)
+            self.frames.clear()
+
+        if code in self._CODE_COMMANDS:
+            self.__code = code
+            self.__send_state(self._CODE_COMMANDS[code])
         else:
             raise ValueError(f"Invalid code: '{code}'. Supported: 'RU', 'JP', 'EU'")
 
+    def __send_state(self, byte : bytes):
+        """Send a command that changes the device state and must never be dropped by the writer"""
+        self.__mark(sticky=True)
+        self.__send_byte(byte)
+
     def clear(self):
         """Clear the display"""
         self._row = 0
         self._column = 0
+        self.__shown = None
+        self.__mark(keyframe=True)
         self.__send_byte(b'\x0C')
 
     def _reset(self):
         """Reset all parameters of the display (after check encoding)"""
         self._row = 0
         self._column = 0
+        self.__shown = None
+        self.__mark(keyframe=True, sticky=True)
         self.__send_byte(b'\x1B\x40')
+        self.glyphs.invalidate()
+        self.__glyphs_selected = False
+
+    def glyph(self, glyph : Union[str, Glyph]) -> str:
+        """Make a user-defined character resident and return the character to put into a line.\n
+        The bitmap is downloaded only when the glyph is not in a slot yet,
+        otherwise the least recently used glyph gives up its slot"""
+        if isinstance(glyph, str):
+            if glyph not in GLYPHS:
+                raise ValueError(f"Unknown glyph: '{glyph}'")
+            glyph = GLYPHS[glyph]
+
+        code = self.glyphs.lookup(glyph)
+        if code is not None:
+            if self.__glyph_metrics is not None:
+                self.__glyph_metrics[0].inc()
+            return chr(code)
+
+        code = self.glyphs.allocate(glyph)
+        command = glyph.command(code)
+        if not self.__glyphs_selected:
+            command += b'\x1B\x25\x01'
+            self.__glyphs_selected = True
+        self.__send_state(command)
+        if self.__glyph_metrics is not None:
+            self.__glyph_metrics[1].inc()
+        return chr(code)
+
+    def glyph_stats(self) -> GlyphStats:
+        return self.glyphs.stats()
 
     def print_line_endl(self, line : str):
         """Print a line of text with line break"""
@@ -72,13 +703,21 @@ class Display:
         self.set_cursor_position((self._row + 1) % (self._max_row_size + 1), 0)
 
     def print_line(self, line : str):
-        """Print a line of text"""
-        line_size = len(line)
-        if line_size + self._column > self._max_column_size:
+        """Print a line of text. Its size is the encoded one, a fallback such as '…' -> '...' takes several cells"""
+        data = self._encode(line)
+        if len(data) + self._column > self._max_column_size:
             raise ValueError("Too many columns")
         else:
-            self.__write_text(line)
-            self._column += line_size
+            self._put_bytes(data)
+
+    def _put_text(self, text : str):
+        """Write a text at the cursor position without checking the line size"""
+        self._put_bytes(self._encode(text))
+
+    def _put_bytes(self, data : bytes):
+        """Write already encoded cells at the cursor position without checking the line size"""
+        self.__send_byte(data)
+        self._column += len(data)
 
     def set_cursor_position(self, row : int, column : int):
         """
@@ -89,49 +728,223 @@ class Display:
         if row > self._max_row_size or column > self._max_column_size:
             raise ValueError("Too many rows or columns")
         else:
-            row_shift = 0x0 + row + 1
-            column_shift = 0x0 + column + 1
-
             self._row = row
             self._column = column
-            self.__send_byte(bytes([0x1F, 0x24, column_shift, row_shift]))
+            self.__send_byte(self._cursor_command(row, column))
+
+    @staticmethod
+    def _cursor_command(row : int, column : int) -> bytes:
+        """US $ command moving the cursor, the display counts from 1"""
+        row_shift = 0x0 + row + 1
+        column_shift = 0x0 + column + 1
+        return bytes([0x1F, 0x24, column_shift, row_shift])
+
+    def make_frame(self, lines : Sequence[str]) -> Frame:
+        """Encode the lines into a Frame. Frames with the same content are taken from the frame cache"""
+        key = tuple(lines)
+        frame = self.frames.get(key)
+        if frame is None:
+            frame = self.__build_frame(key)
+            self.frames.put(key, frame)
+        return frame
+
+    def __build_frame(self, lines : tuple) -> Frame:
+        width = self.columns
+        if len(lines) > self._max_row_size + 1:
+            raise ValueError("Too many rows")
+
+        rows = []
+        for row in range(0, self._max_row_size + 1):
+            line = self._encode(lines[row]) if row < len(lines) else b""
+            if len(line) > width:
+                raise ValueError("Too many columns")
+            rows.append(line.ljust(width))
+
+        commands, cursor = self._draw_commands(rows)
+        return Frame(lines, tuple(rows), b'\x0C' + bytes(commands), cursor)
+
+    def show(self, frame : Frame, preempt : bool = False) -> RenderResult:
+        """Clear the display and draw a pre-rendered frame.
+        The frame is always a keyframe, so it supersedes the frames still queued for the writer"""
+        self.__mark(keyframe=True)
+        self.__send_byte(frame.payload)
+        self._row, self._column = frame.cursor
+        self.__shown = frame
+        return RenderResult(len(frame.payload), len(frame.payload))
 
     def get_cursor_position(self):
         """Return the cursor position of the display"""
         return self._row, self._column
 
+    @property
+    def columns(self) -> int:
+        """Number of characters that fit in a row"""
+        return self._max_column_size
+
+class FrameBuffer:
+    """Shadow screen of the display: the encoded byte of every cell in one fixed bytearray.\n
+    Rows are zero-copy memoryview slices and every change bumps the version,
+    so a snapshot is copied once per version and comparing with it costs no allocation"""
+    BLANK = b" "
+
+    def __init__(self, rows : int, columns : int):
+        self.__rows = rows
+        self.__columns = columns
+        self.__data = bytearray(self.BLANK * (rows * columns))
+        self.__view = memoryview(self.__data)
+        self.__blank = bytes(self.__data)
+        self.__version = 0
+        self.__snapshot = self.__blank
+        self.__snapshot_version = 0
+
+    @property
+    def rows(self) -> int:
+        return self.__rows
+
+    @property
+    def columns(self) -> int:
+        return self.__columns
+
+    @property
+    def version(self) -> int:
+        """Number of changes since the buffer was created"""
+        return self.__version
+
+    def row(self, row : int) -> memoryview:
+        """Cells of a row without copying them"""
+        start = row * self.__columns
+        return self.__view[start:start + self.__columns]
+
+    def write(self, row : int, column : int, data : bytes):
+        """Put encoded cells at the position"""
+        if row >= self.__rows or column + len(data) > self.__columns:
+            raise ValueError("Too many rows or columns")
+        start = row * self.__columns + column
+        self.__view[start:start + len(data)] = data
+        self.__version += 1
+
+    def load(self, screen : bytes):
+        """Replace the whole screen, the size must match"""
+        self.__view[:] = screen
+        self.__version += 1
+
+    def clear(self):
+        """Fill the buffer with blanks in place"""
+        self.__view[:] = self.__blank
+        self.__version += 1
+
+    def snapshot(self) -> bytes:
+        """Immutable copy of the screen, taken once per version"""
+        if self.__snapshot_version != self.__version:
+            self.__snapshot = bytes(self.__data)
+            self.__snapshot_version = self.__version
+        return self.__snapshot
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, FrameBuffer):
+            return self is other or self.snapshot() == other.snapshot()
+        return NotImplemented
+
+    __hash__ = None
+
+
 class DisplayWithBuffer(Display):
     """Class for working with serial display and save data in lines"""
-    def __init__(self, display_name : str, baudrate : int =9600, code : str = "RU", max_row_size : int = 1, max_col_size : int = 19):
-        super().__init__(display_name,baudrate,code,max_row_size,max_col_size)
-        self.__data = [[' ' for _ in range(0, self._max_column_size + 1)] for _ in range(0, self._max_row_size + 1)]
+    def __init__(self, display_name : str, baudrate : int =9600, code : str = "RU", max_row_size : int = 1, max_col_size : int = 19,
+                 **kwargs):
+        self.__buffer = FrameBuffer(max_row_size + 1, max_col_size + 1)
+        super().__init__(display_name,baudrate,code,max_row_size,max_col_size, **kwargs)
+
+    @property
+    def columns(self) -> int:
+        return self._max_column_size + 1
+
+    @property
+    def buffer(self) -> FrameBuffer:
+        return self.__buffer
 
     def clear(self):
         super().clear()
-        self.__clear_data()
+        self.__buffer.clear()
 
     def reset(self):
         super()._reset()
-        self.__clear_data()
+        self.__buffer.clear()
 
     def print_line(self, line):
-        self.__set_data(line)
+        row, column = self._row, self._column
         super().print_line(line)
+        self.__buffer.write(row, column, self._encode(line))
 
-    def __set_data(self, data : str):
-        """Update the data in lines"""
-        data_size = len(data)
-        if self._row > self._max_row_size or self._column + data_size - 1 > self._max_column_size:
-            raise ValueError("Too many rows or columns")
+    def render_frame(self, lines : Sequence[str]) -> RenderResult:
+        """
+        Draw a whole frame, sending only the runs of cells that differ from the buffer.
+        When most of the frame changes, a clear with a redraw of the new text is sent instead if it is shorter
+        :param lines: text of every row, missing rows and short lines are padded with spaces
+        :return: bytes sent and bytes a clear with full redraw would take
+        """
+        return self.show(self.make_frame(lines))
+
+    def show(self, frame : Frame, preempt : bool = False) -> RenderResult:
+        """Draw a pre-rendered frame, sending only what differs from the buffer.
+        With preempt (a mode switch) the frames the writer has not finished are given up:
+        the frame is then sent in full as a keyframe instead of as a diff behind them"""
+        full = len(frame.payload)
+        screen = frame.screen
+        if self.__buffer.snapshot() == screen:
+            return RenderResult(0, full)
+
+        diff = []
+        diff_cost = 0
+        cursor = (self._row, self._column)
+        for row, target in enumerate(frame.rows):
+            current = self.__buffer.row(row)
+            for start, end in self.__changed_runs(current, target):
+                diff_cost += end - start + (self._CURSOR_MOVE_SIZE if cursor != (row, start) else 0)
+                diff.append((row, start, target[start:end]))
+                cursor = (row, end)
+
+        with self.frame():
+            if full < diff_cost or (preempt and self.backlog):
+                super().show(frame)
+                sent = full
+            else:
+                sent = 0
+                for row, start, data in diff:
+                    if (self._row, self._column) != (row, start):
+                        self.set_cursor_position(row, start)
+                        sent += self._CURSOR_MOVE_SIZE
+                    self._put_bytes(data)
+                    sent += len(data)
+            self.__buffer.load(screen)
+
+        return RenderResult(sent, full)
+
+    @classmethod
+    def __changed_runs(cls, current : memoryview, target : bytes) -> list:
+        """Find the runs of changed cells. Runs separated by fewer unchanged cells
+        than a cursor move costs are merged and the gap is rewritten"""
+        runs = []
+        for column, (old, new) in enumerate(zip(current, target)):
+            if old == new:
+                continue
+            if runs and column - runs[-1][1] <= cls._CURSOR_MOVE_SIZE:
+                runs[-1][1] = column + 1
+            else:
+                runs.append([column, column + 1])
+        return runs
 
-        for column in range(0, data_size):
-            self.__data[self._row][column + self._column] = data[column]
+    def _screen_commands(self) -> bytes:
+        """Redraw of the shadow buffer, the cursor is left where it is now"""
+        commands, cursor = self._draw_commands([self.__buffer.row(row) for row in range(self.__buffer.rows)])
+        if cursor != (self._row, self._column):
+            commands += self._cursor_command(self._row, self._column)
+        return bytes(commands)
 
-    def __clear_data(self):
-        """Clear the data in lines"""
-        self.__data = [[' ' for _ in range(0, self._max_column_size + 1)] for _ in range(0, self._max_row_size + 1)]
+    def _redraw_commands(self) -> bytes:
+        return b'\x0C' + self._screen_commands()
 
     def print_data(self):
         """Print the data"""
         for row in range(0, self._max_row_size+1):
-            print(self.__data[row])
\ No newline at end of file
+            print(bytes(self.__buffer.row(row)))
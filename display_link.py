@@ -0,0 +1,47 @@
+from typing import Callable, Optional, Sequence
+
+# rates of the DM-D110 interface, the fastest first
+SUPPORTED_BAUDRATES = (115200, 38400, 19200, 9600)
+
+# DLE EOT 1: real-time status request, the device answers with one status byte
+STATUS_REQUEST = b'\x10\x04\x01'
+
+
+def probe(port, timeout : float = 0.2) -> bool:
+    """Check the link with a round-trip: send a status request and wait for the reply byte"""
+    previous_timeout = port.timeout
+    port.timeout = timeout
+    try:
+        port.reset_input_buffer()
+        port.write(STATUS_REQUEST)
+        port.flush()
+        return len(port.read(1)) == 1
+    finally:
+        port.timeout = previous_timeout
+
+
+def negotiate(port, rates : Sequence[int] = SUPPORTED_BAUDRATES, switch : Optional[Callable[[int], bytes]] = None,
+              timeout : float = 0.2) -> Optional[int]:
+    """
+    Find the fastest rate the device answers at and leave the port on it.\n
+    The DM-D110 takes its rate from the DIP switches, so by default the rates are only probed.
+    Devices that change the rate by a command get it from switch(rate), sent at the current rate before the port follows
+    :param port: open serial port, its baudrate is changed in place
+    :param rates: candidate rates, tried from the fastest
+    :param switch: command that moves the device to a rate, None if the rate is set on the device
+    :return: the verified rate, None if the device answered at none of them (the port keeps its original rate)
+    """
+    original = port.baudrate
+    for rate in sorted(rates, reverse=True):
+        if switch is not None and rate != port.baudrate:
+            port.write(switch(rate))
+            port.flush()
+        port.baudrate = rate
+        if probe(port, timeout):
+            return rate
+
+    if switch is not None and port.baudrate != original:
+        port.write(switch(original))
+        port.flush()
+    port.baudrate = original
+    return None
@@ -0,0 +1,354 @@
+import os
+import select
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
+
+import serial
+
+
+class TransportError(OSError):
+    """The link can not take the data, handled like a lost serial port"""
+
+
+@dataclass(frozen=True)
+class TransportStats:
+    writes: int
+    bytes_written: int
+    pending: int
+    busy: float
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second while the link was busy taking data"""
+        return self.bytes_written / self.busy if self.busy else 0.0
+
+
+class Transport(ABC):
+    """Byte link to a display.\n
+    write_nowait() hands over what the link takes at once, keeps the rest pending and returns immediately,
+    drain() waits until nothing is pending, write() does both. The lock is not held while waiting,
+    so close() from another thread is not blocked by a stalled link and makes the waiting write fail"""
+    def __init__(self, name : str):
+        self.name = name
+        self._lock = threading.RLock()
+        self.__pending = bytearray()
+        self.__writes = 0
+        self.__bytes = 0
+        self.__busy = 0.0
+
+    @abstractmethod
+    def open(self):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+    @property
+    @abstractmethod
+    def is_open(self) -> bool:
+        pass
+
+    @abstractmethod
+    def _send(self, data : memoryview) -> int:
+        """Send what the link takes without blocking, return the number of bytes taken"""
+
+    @abstractmethod
+    def _wait_writable(self, timeout : Optional[float]):
+        """Block until the link can take more data or the timeout expires"""
+
+    def write(self, data : bytes, timeout : Optional[float] = None) -> int:
+        """Write all the data, blocking until the link took it"""
+        with self._lock:
+            self.__writes += 1
+            if self.__pending:
+                self.__pending += data
+            else:
+                # nothing queued: hand the data to the link without copying it
+                started = time.perf_counter()
+                sent = self._send(memoryview(data))
+                self.__bytes += sent
+                self.__busy += time.perf_counter() - started
+                if sent == len(data):
+                    return sent
+                self.__pending += memoryview(data)[sent:]
+        if not self.drain(timeout):
+            raise TransportError(f"{self.name}: write timed out")
+        return len(data)
+
+    def write_nowait(self, data : bytes) -> int:
+        """Queue the data and send what the link takes now. Returns the bytes still pending"""
+        with self._lock:
+            self.__pending += data
+            self.__writes += 1
+            self.__pump()
+            return len(self.__pending)
+
+    def drain(self, timeout : Optional[float] = None) -> bool:
+        """Send the pending data. Return False if some is left when the timeout expires,
+        raise TransportError if the link is closed meanwhile"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self.is_open:
+                    raise TransportError(f"{self.name}: closed while writing")
+                self.__pump()
+                if not self.__pending:
+                    return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            started = time.perf_counter()
+            self._wait_writable(remaining)
+            self.__busy += time.perf_counter() - started
+
+    @property
+    def pending(self) -> int:
+        return len(self.__pending)
+
+    def discard(self):
+        """Drop the pending data, the link was lost"""
+        with self._lock:
+            self.__pending.clear()
+
+    def stats(self) -> TransportStats:
+        return TransportStats(self.__writes, self.__bytes, len(self.__pending), self.__busy)
+
+    def __pump(self):
+        if not self.__pending:
+            return
+        started = time.perf_counter()
+        with memoryview(self.__pending) as view:
+            sent = self._send(view)
+        del self.__pending[:sent]
+        self.__bytes += sent
+        self.__busy += time.perf_counter() - started
+
+
+class SerialTransport(Transport):
+    """Serial port in non-blocking write mode.\n
+    With output_ahead set, no more than that many seconds of wire time are handed to the driver,
+    the rest stays pending here. A backlog then builds up in the frame writer, where a new frame
+    can supersede it, and not in the driver buffer, where it would be sent out regardless"""
+    BITS_PER_BYTE = 10
+
+    def __init__(self, port : str, baudrate : int = 9600, output_ahead : Optional[float] = None):
+        super().__init__(port)
+        self.__baudrate = baudrate
+        self.__port: Optional[serial.Serial] = None
+        self.output_ahead = output_ahead
+
+    @property
+    def port(self) -> Optional[serial.Serial]:
+        """The underlying serial port, for link negotiation"""
+        return self.__port
+
+    @property
+    def baudrate(self) -> int:
+        return self.__baudrate
+
+    @baudrate.setter
+    def baudrate(self, value : int):
+        self.__baudrate = value
+        if self.__port is not None:
+            self.__port.baudrate = value
+
+    def open(self):
+        if self.__port is None:
+            self.__port = serial.Serial(port=self.name, baudrate=self.__baudrate, write_timeout=0)
+
+    def close(self):
+        self.discard()
+        if self.__port is not None:
+            port, self.__port = self.__port, None
+            port.close()
+
+    @property
+    def is_open(self) -> bool:
+        return self.__port is not None
+
+    def _send(self, data : memoryview) -> int:
+        if self.__port is None:
+            raise TransportError(f"{self.name}: port is closed")
+        if self.output_ahead is not None:
+            room = self.__output_limit() - self.__out_waiting()
+            if room <= 0:
+                return 0
+            data = data[:room]
+        return self.__port.write(data) or 0
+
+    def __output_limit(self) -> int:
+        return max(int(self.output_ahead * self.__baudrate / self.BITS_PER_BYTE), 1)
+
+    def __out_waiting(self) -> int:
+        try:
+            return self.__port.out_waiting
+        except (OSError, AttributeError, NotImplementedError):
+            return 0  # the driver can not tell, the limit then only sizes the writes
+
+    def _wait_writable(self, timeout : Optional[float]):
+        # serial ports have no readiness to wait for: sleep about the wire time
+        # of what is pending, or until half of the driver backlog is on the wire
+        if self.output_ahead is None:
+            waiting = self.pending
+        else:
+            waiting = self.__out_waiting() - self.__output_limit() // 2
+            if waiting <= 0:
+                return
+        wait = min(waiting * self.BITS_PER_BYTE / self.__baudrate, 0.05)
+        time.sleep(wait if timeout is None else min(wait, timeout))
+
+
+class TcpTransport(Transport):
+    """Raw TCP link to a network serial server.\n
+    One connection is kept and reused for every frame, Nagle is off,
+    so frames are pipelined back to back without waiting for each other"""
+    def __init__(self, host : str, port : int, connect_timeout : float = 3.0):
+        super().__init__(f"tcp://{host}:{port}")
+        self.__address = (host, port)
+        self.__connect_timeout = connect_timeout
+        self.__socket: Optional[socket.socket] = None
+
+    def open(self):
+        if self.__socket is not None:
+            return
+        sock = socket.create_connection(self.__address, self.__connect_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setblocking(False)
+        self.__socket = sock
+
+    def close(self):
+        self.discard()
+        if self.__socket is not None:
+            sock, self.__socket = self.__socket, None
+            sock.close()
+
+    @property
+    def is_open(self) -> bool:
+        return self.__socket is not None
+
+    def _send(self, data : memoryview) -> int:
+        if self.__socket is None:
+            raise TransportError(f"{self.name}: not connected")
+        try:
+            return self.__socket.send(data)
+        except BlockingIOError:
+            return 0
+
+    def _wait_writable(self, timeout : Optional[float]):
+        sock = self.__socket
+        if sock is None:
+            return
+        try:
+            select.select([], [sock], [], timeout)
+        except (OSError, ValueError):
+            pass  # closed meanwhile, drain() sees it
+
+
+class PtyTransport(Transport):
+    """Pseudo-terminal link. With a path the existing tty is written,
+    without one a new pty pair is made and the display side is slave_name (POSIX only)"""
+    def __init__(self, path : Optional[str] = None):
+        super().__init__(f"pty://{path or ''}")
+        self.__path = path
+        self.__fd: Optional[int] = None
+        self.__slave: Optional[int] = None
+        self.slave_name: Optional[str] = path
+
+    def open(self):
+        if self.__fd is not None:
+            return
+        if self.__path is not None:
+            self.__fd = os.open(self.__path, os.O_WRONLY | os.O_NOCTTY | os.O_NONBLOCK)
+            return
+        import tty  # POSIX only
+
+        self.__fd, self.__slave = os.openpty()
+        tty.setraw(self.__slave)  # binary commands, no line buffering or echo
+        os.set_blocking(self.__fd, False)
+        self.slave_name = os.ttyname(self.__slave)
+
+    def close(self):
+        self.discard()
+        for fd in (self.__fd, self.__slave):
+            if fd is not None:
+                os.close(fd)
+        self.__fd = self.__slave = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.__fd is not None
+
+    def _send(self, data : memoryview) -> int:
+        if self.__fd is None:
+            raise TransportError(f"{self.name}: pty is closed")
+        try:
+            return os.write(self.__fd, data)
+        except BlockingIOError:
+            return 0
+
+    def _wait_writable(self, timeout : Optional[float]):
+        fd = self.__fd
+        if fd is None:
+            return
+        try:
+            select.select([], [fd], [], timeout)
+        except (OSError, ValueError):
+            pass  # closed meanwhile, drain() sees it
+
+
+class MemoryTransport(Transport):
+    """Keeps everything written, for tests and benchmarks without hardware"""
+    def __init__(self, name : str = "memory"):
+        super().__init__(f"memory://{name}")
+        self.data = bytearray()
+        self.writes: list[bytes] = []
+        self.__open = False
+
+    def open(self):
+        self.__open = True
+
+    def close(self):
+        self.discard()
+        self.__open = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.__open
+
+    def _send(self, data : memoryview) -> int:
+        if not self.__open:
+            raise TransportError(f"{self.name}: closed")
+        self.data += data
+        self.writes.append(bytes(data))
+        return len(data)
+
+    def _wait_writable(self, timeout : Optional[float]):
+        pass
+
+
+def open_transport(address : str, baudrate : int = 9600) -> Transport:
+    """Open the transport for an address:\n
+    tcp://host:port - network serial server\n
+    pty or pty:///dev/pts/N - new or existing pseudo-terminal\n
+    memory://name - in-memory link\n
+    anything else is a serial port name (COM3, /dev/ttyUSB0)"""
+    if address == "pty" or address.startswith("pty://"):
+        transport = PtyTransport(urlsplit(address).path or None)
+    elif address.startswith("tcp://"):
+        url = urlsplit(address)
+        if url.hostname is None or url.port is None:
+            raise ValueError(f"Invalid address: '{address}'. Expected tcp://host:port")
+        transport = TcpTransport(url.hostname, url.port)
+    elif address.startswith("memory://"):
+        transport = MemoryTransport(address[len("memory://"):])
+    else:
+        transport = SerialTransport(address, baudrate)
+    transport.open()
+    return transport